@@ -1,40 +1,89 @@
 import os
+import json
+import time
+import asyncio
 from typing import TypedDict, Optional, List
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
 from langgraph.graph import StateGraph, END
-from openai import OpenAI
-from tools import get_article_url, scrape_article, post_to_linkedin, post_to_twitter, update_google_sheet, add_url_to_sheet 
+from llm_cache import CachedChatModel
+from resilience import LLM_TIMEOUT
+from router import GEMINI_MODEL, RoutedChatModel, model_router
+from summarize import summarize_content, count_tokens, SUMMARY_MAP_REDUCE_THRESHOLD
+from dedup import dedup_index, DEDUP_ENABLED
+from preprocess import preprocess_content
+from prompts import LINKEDIN_PROMPT, TWITTER_PROMPT, direct_prompt, direct_response_format
+from clients import run_blocking
+from checkpoints import checkpointed, checkpoint_store
+from blobs import blob_store
+from watcher import release_when_written, PLATFORM_STATUS_COLUMNS
+from metrics import timed_node, duplicates, preprocess_tokens, generation_runs, generation_duration
+from tools import get_article_url, get_unprocessed_urls, scrape_article, post_to_linkedin, post_to_twitter, update_google_sheet, add_url_to_sheet 
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-
-llm = ChatOpenAI(
-    model="gemini-2.5-flash",
-    temperature=0,
-    api_key=GOOGLE_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/"
-)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/")
+BACKLOG_MAX_CONCURRENCY = int(os.getenv("BACKLOG_MAX_CONCURRENCY", "5"))
+# Twitter is opt-in ("linkedin,twitter"): it needs its own credentials and the v1.1 API
+AGENT_PLATFORMS = os.getenv("AGENT_PLATFORMS", "linkedin")
+# "two_step" summarizes the article, then writes each post from the summary;
+# "direct" writes every post from the article in one call. Articles longer
+# than DIRECT_MAX_TOKENS always take the two-step path.
+AGENT_MODES = ("two_step", "direct")
+AGENT_MODE = os.getenv("AGENT_MODE", "two_step")
+DIRECT_MAX_TOKENS = int(os.getenv("DIRECT_MAX_TOKENS", str(SUMMARY_MAP_REDUCE_THRESHOLD)))
+
+_llms = {}
+
+def get_llm(model: str = GEMINI_MODEL) -> CachedChatModel:
+    """Returns the chat model for `model`, created on first use so importing the graph needs no API key."""
+    if model not in _llms:
+        _llms[model] = CachedChatModel(ChatOpenAI(
+            model=model,
+            temperature=0,
+            api_key=GOOGLE_API_KEY,
+            base_url=GEMINI_BASE_URL,
+            timeout=LLM_TIMEOUT
+        ))
+    return _llms[model]
+
+# Summaries pick their model per call (see router.py)
+routed_llm = RoutedChatModel(get_llm)
 
 class AgentState(TypedDict):
     url: Optional[str]
-    scraped_content: Optional[str]
+    # Id of the Firecrawl result in the blob store; the document itself stays out of the state
+    scraped_content_id: Optional[str]
+    article: Optional[str]
+    preprocess_report: Optional[dict]
     summary: Optional[str]
     linkedin_content: Optional[str]
-    # twitter_content: Optional[str]
+    twitter_content: Optional[str]
     linkedin_status: str | None
-    # twitter_status: str | None
+    twitter_status: str | None
     sheet_row_index: int | None
-
-def add_url_to_sheet_node(state: AgentState) -> dict:
+    backlog: bool | None
+    max_concurrency: int | None
+    backlog_limit: int | None
+    batch_results: List[dict] | None
+    duplicate_of: Optional[dict]
+    mode: Optional[str]
+    generation_mode: Optional[str]
+    generation_started_at: Optional[float]
+    run_id: Optional[str]
+
+def agent_node(name: str, fn):
+    """Times a node and checkpoints its output, so a resumed run skips it."""
+    return checkpointed(name, timed_node("agent", name, fn))
+
+async def add_url_to_sheet_node(state: AgentState) -> dict:
     url_to_add = state.get("url")
     if not url_to_add:
         print("Error: No URL provided to add to sheet.")
         return {"url": None, "sheet_row_index": None}
 
     try:
-        row_index = add_url_to_sheet.invoke({
+        row_index = await run_blocking(add_url_to_sheet.invoke, {
             "sheet_name": "News Media Links",
             "link_column": "Media Links",
             "url": url_to_add
@@ -44,11 +93,12 @@ def add_url_to_sheet_node(state: AgentState) -> dict:
         print(f"Failed to add URL to sheet: {e}")
         return {"url": None, "sheet_row_index": None}
 
-def fetch_link_node(state: AgentState) -> dict:
+async def fetch_link_node(state: AgentState) -> dict:
     print('Fetching Link')
-    result = get_article_url.invoke({
+    result = await run_blocking(get_article_url.invoke, {
         "sheet_name": "News Media Links",
-        "link_column": "Media Links"
+        "link_column": "Media Links",
+        "status_columns": STATUS_COLUMNS,
     })
     
     if result:
@@ -58,205 +108,325 @@ def fetch_link_node(state: AgentState) -> dict:
     else:
         return {"url": None, "sheet_row_index": None}
 
-def scrape_node(state: AgentState) -> dict:
+async def scrape_node(state: AgentState) -> dict:
     url_to_scrape = state.get("url")
     if not url_to_scrape:
-        return {"scraped_content": None}
-    scraped_content = scrape_article.invoke({"url": url_to_scrape})
-    return {"scraped_content": scraped_content}
-
-def summarize_node(state: AgentState) -> dict:
-    print('Started summarizing content')
-    scraped_content = state.get("scraped_content")
+        return {"scraped_content_id": None}
+    scraped_content = await run_blocking(scrape_article.invoke, {"url": url_to_scrape})
+    if not scraped_content:
+        return {"scraped_content_id": None}
+    return {"scraped_content_id": await run_blocking(blob_store.put, scraped_content)}
+
+async def load_scraped_content(state: AgentState):
+    """The scraped document the state refers to, or None."""
+    blob_id = state.get("scraped_content_id")
+    if not blob_id:
+        return None
+    scraped_content = await run_blocking(blob_store.get, blob_id)
+    if scraped_content is None:
+        print(f"Scraped content {blob_id} has expired from the blob store")
+    return scraped_content
+
+async def check_url_node(state: AgentState) -> dict:
+    url = state.get("url")
+    if not (DEDUP_ENABLED and url):
+        return {"duplicate_of": None}
+    duplicate_of = await run_blocking(dedup_index.check_url, url, state.get("sheet_row_index"))
+    if duplicate_of:
+        print(f"Skipping duplicate URL {url} (row {duplicate_of['sheet_row_index']})")
+        duplicates.inc(match="url")
+    return {"duplicate_of": duplicate_of}
+
+async def preprocess_node(state: AgentState) -> dict:
+    scraped_content = await load_scraped_content(state)
     if not scraped_content:
+        return {"article": None, "preprocess_report": None}
+    article, report = await run_blocking(preprocess_content, scraped_content)
+    preprocess_tokens.inc(report["tokens_before"], stage="before")
+    preprocess_tokens.inc(report["tokens_after"], stage="after")
+    print(f"Preprocessed article: {report['tokens_before']} -> {report['tokens_after']} tokens ({report['reduction']:.0%} smaller)")
+    return {"article": article, "preprocess_report": report}
+
+async def check_content_node(state: AgentState) -> dict:
+    article = state.get("article")
+    if not (DEDUP_ENABLED and article):
+        return {"duplicate_of": None}
+    duplicate_of = await run_blocking(
+        dedup_index.check_content, state["url"], article, state.get("sheet_row_index")
+    )
+    if duplicate_of:
+        print(f"Skipping near-duplicate article {state['url']} (matches {duplicate_of['url']})")
+        duplicates.inc(match="content")
+    return {"duplicate_of": duplicate_of}
+
+async def mark_duplicate_node(state: AgentState) -> dict:
+    original_row = state["duplicate_of"].get("sheet_row_index")
+    status = f"Duplicate of row {original_row}" if original_row else "Duplicate"
+    statuses = {f"{platform}_status": status for platform in PLATFORMS}
+    if state.get("sheet_row_index"):
+        await run_blocking(update_google_sheet.invoke, {
+            "sheet_name": "News Media Links",
+            "link_column": "Media Links",
+            "row_index": state["sheet_row_index"],
+            **statuses,
+        })
+    return statuses
+
+def route_duplicate(next_node: str):
+    return lambda state: "mark_duplicate" if state.get("duplicate_of") else next_node
+
+def route_generation(state: AgentState) -> str:
+    """Sends short enough articles to the single-pass node when direct mode is on."""
+    if state.get("duplicate_of"):
+        return "mark_duplicate"
+    article = state.get("article")
+    if (state.get("mode") or AGENT_MODE) != "direct" or not article:
+        return "summarize"
+    report = state.get("preprocess_report") or {}
+    tokens = report.get("tokens_after") or count_tokens(article)
+    if tokens > DIRECT_MAX_TOKENS:
+        print(f"Article has {tokens} tokens, over DIRECT_MAX_TOKENS; summarizing first")
+        return "summarize"
+    return "generate_direct"
+
+async def summarize_node(state: AgentState) -> dict:
+    print('Started summarizing content')
+    # A failed direct attempt keeps its start time, so the fallback's cost shows up
+    started_at = state.get("generation_started_at") or time.time()
+    article = state.get("article") or await load_scraped_content(state)
+    if not article:
         return {"summary": None}
     
-    prompt = f"""
-    Article Content: {scraped_content}
-    Write a concise summary of the above content. (500 words)
-    """
-    response = llm.invoke(prompt)
+    summary = await summarize_content(routed_llm, article)
     print('Content summarized')
-    return {"summary": response.content}
-
-EXAMPLE_POST = f"""
-        THEY DON’T JUST FOLLOW ORDERS.
-        They whisper back.
-
-        That was my first impression when I built an AI AGENT.
-        It didn’t just execute.
-        It decided.
-
-        Think of it as a detective on your team.
-        Give them a clue, and they won’t stop until the dots are connected.
-        The answers they bring back aren’t what you asked for — they’re what you needed.
-
-        In workflows, this changes everything.
-        Agents don’t just repeat tasks.
-        They adapt, anticipate, and surprise.
-
-        And here’s the shift:
-        Companies that treat AI as a loyal assistant will soon be outrun by those who treat it as a STRATEGIC PARTNER.
-
-        Because the future isn’t about replacing effort.
-        It’s about replacing GUESSWORK.
-
-        QUESTION FOR YOU:
-        Would you rather have a tool that obeys blindly…
-        Or a partner that thinks beside you?
-        """
-
-def generate_content_node(state: AgentState) -> dict:
-    print('Formatting the content for social media post')
-    summary = state.get("summary")
-    if not summary:
-        # return {"linkedin_content": None, "twitter_content": None}
-        return {"linkedin_content": None}
-
-    # Generate LinkedIn content
-    LINKEDIN_SYSTEM_PROMPT = f"""
-        You are an assistant that writes short, engaging LinkedIn technical blogs.  
-        Your job is to explain technical topics (AI, data, blockchain, productivity, etc.) in the storytelling style of a fiction author, but in LinkedIn-friendly format.  
-
-        Style Rules (Fiction-to-LinkedIn Sheet):
-        1. Hook First: Start with 1–2 ALL CAPS lines that create curiosity, tension, or a striking metaphor.  
-        2. Narrative Flow: Use storytelling devices (imagery, suspense, metaphors) to make technical ideas vivid.  
-        3. Formatting Rules:
-            - Each paragraph must be 1–3 lines max.  
-            - Add a blank line between every paragraph.  
-            - Do not merge multiple ideas into one block.  
-            - When emphasizing key concepts, use ALL CAPS (no bold, italics, or markdown).  
-            - No markdown, hashtags, or emojis. Keep it clean and native to LinkedIn.  
-        4. Vocabulary: Use the fiction author’s style — descriptive, imaginative, slightly dramatic — but mapped to technical concepts.  
-        5. Takeaway: End with a reflection, question, or challenge that invites readers to think or engage.  
-        6. Length: Keep posts between 150–250 words (LinkedIn sweet spot).  
-
-        Output Format:
-        - Write directly as if posting on LinkedIn.  
-        - No markdown symbols like ##, *, or **, no emojis, no hashtags.  
-        - Use line spacing + ALL CAPS words for emphasis.  
-
-        Example:
-        {EXAMPLE_POST}
-
-        Now, write a new LinkedIn post in this style based on the following context:
-
-        {summary}
-
-        Always return only the LinkedIn post text. Do not add explanations, formatting notes, or markdown.
-        """
-    linkedin_response = llm.invoke(LINKEDIN_SYSTEM_PROMPT).content
-
-    # Generate Twitter content 
-    TWITTER_SYSTEM_PROMPT = f"""
-        You are an assistant that writes short, engaging Twitter (X) posts.  
-        Your job is to explain technical topics (AI, data, blockchain, productivity, etc.) in a sharp, storytelling style that grabs attention quickly.  
-
-        Style Rules (Fiction-to-Twitter Sheet):
-        1. HOOK FIRST: Start with a bold, curiosity-driven line (metaphor, striking fact, or tension).  
-        2. BREVITY: Max 280 characters. Use concise, impactful sentences.  
-        3. FORMATTING:
-            - Keep text crisp and scannable.  
-            - Use ALL CAPS or spacing for emphasis (e.g., AI AGENT, BLOCKCHAIN, STRATEGIC PARTNER).  
-            - No markdown, no hashtags (unless essential), no emojis.  
-        4. VOICE: Slightly dramatic, imaginative, but direct — inspired by a fiction author’s narrative style.  
-        5. ENGAGEMENT: End with a reflective question, insight, or challenge to provoke replies.  
-        6. LENGTH: 1–3 short paragraphs max, but under 280 characters.  
-
-        Output Format:
-        - Write directly as if posting on Twitter/X.  
-        - No markdown symbols like ##, *, or **, no emojis (unless explicitly requested).  
-        - Use short line breaks only when it adds impact.  
-
-        Example Posts:
-        EXAMPLE 1:
-        THEY DON’T JUST FOLLOW ORDERS.  
-        They whisper back.  
-        That’s an AI AGENT. Not a tool — a partner.  
-        Would you trust it to make the call?
-
-        EXAMPLE 2:
-        TRUST IS FRAGILE.  
-        Once broken, it rarely returns.  
-        That’s why BLOCKCHAIN isn’t just code.  
-        It’s trust, etched in stone.  
-        Do we trust tech more than people?
-
-        Now, write a new Twitter post in this style based on the following context:
-
-        {summary}
-
-        Always return only the Twitter post text. Do not add explanations, formatting notes, or markdown.
-        """  
-    # twitter_response = llm.invoke(TWITTER_SYSTEM_PROMPT).content
-    print('Data formatted for post')
-    return {
-        "linkedin_content": linkedin_response,
-        # "twitter_content": twitter_response,
-    }
-
-def post_content_node(state: AgentState) -> dict:
+    return {"summary": summary, "generation_mode": "two_step", "generation_started_at": started_at}
+
+# Each platform gets its own generation branch in the graph; they run
+# concurrently and are joined before post_content.
+PLATFORM_PROMPTS = {
+    "linkedin": LINKEDIN_PROMPT,
+    "twitter": TWITTER_PROMPT,
+}
+
+PLATFORM_POSTERS = {
+    "linkedin": lambda content, scope: post_to_linkedin.ainvoke({"post_content": content, "scope": scope}),
+    "twitter": lambda content, scope: post_to_twitter.ainvoke({"tweet_content": content, "scope": scope}),
+}
+
+PLATFORMS = [p.strip() for p in AGENT_PLATFORMS.split(",") if p.strip() in PLATFORM_PROMPTS]
+# A row counts as processed once the status of any of these platforms is written
+STATUS_COLUMNS = [PLATFORM_STATUS_COLUMNS[platform] for platform in PLATFORMS]
+
+def make_generate_node(platform: str):
+    """Builds the async generation node for one platform."""
+    prompt = PLATFORM_PROMPTS[platform]
+
+    async def generate_platform_node(state: AgentState) -> dict:
+        print(f'Formatting the content for {platform} post')
+        summary = state.get("summary")
+        if not summary:
+            return {f"{platform}_content": None}
+
+        async def call(model):
+            messages, kwargs = await prompt.request(summary, model)
+            return await get_llm(model).ainvoke(messages, **kwargs)
+
+        response = await model_router.run("rewrite", count_tokens(summary), call)
+        print(f'Data formatted for {platform} post')
+        return {f"{platform}_content": response.content}
+
+    generate_platform_node.__name__ = f"generate_{platform}_node"
+    return generate_platform_node
+
+async def generate_direct_node(state: AgentState) -> dict:
+    """Writes every platform's post straight from the cleaned article in one structured call."""
+    print('Generating all posts from the article')
+    started_at = time.time()
+    prompt = direct_prompt(PLATFORMS)
+
+    async def call(model):
+        messages, kwargs = await prompt.request(state["article"], model)
+        return await get_llm(model).ainvoke(messages, response_format=direct_response_format(PLATFORMS), **kwargs)
+
+    tokens = (state.get("preprocess_report") or {}).get("tokens_after") or count_tokens(state["article"])
+    response = await model_router.run("direct", tokens, call)
+    try:
+        posts = json.loads(response.content)
+    except ValueError:
+        posts = None
+    if not isinstance(posts, dict) or not any(isinstance(posts.get(p), str) and posts[p].strip() for p in PLATFORMS):
+        print('Direct generation did not return usable posts; falling back to summarizing')
+        return {"generation_mode": None, "generation_started_at": started_at}
+    print('Posts generated')
+    contents = {f"{p}_content": posts[p] if isinstance(posts.get(p), str) and posts[p].strip() else None for p in PLATFORMS}
+    return {**contents, "generation_mode": "direct", "generation_started_at": started_at}
+
+def route_direct(state: AgentState) -> str:
+    return "post_content" if state.get("generation_mode") == "direct" else "summarize"
+
+async def post_content_node(state: AgentState) -> dict:
     print('Attempting to post')
-    linkedin_content = state.get("linkedin_content")
-    # twitter_content = state.get("twitter_content")
-    
-    linkedin_status = "Skipped"
-    # twitter_status = "Skipped"
-
-    if linkedin_content:
-        linkedin_status = post_to_linkedin.invoke({"post_content": linkedin_content})
-    
-    # if twitter_content:
-    #     twitter_status = post_to_twitter.invoke({"tweet_content": twitter_content})
-    
-    return {
-        "linkedin_status": linkedin_status,
-        # "twitter_status": twitter_status
+    if state.get("generation_mode"):
+        generation_runs.inc(requested=state.get("mode") or AGENT_MODE, mode=state["generation_mode"])
+        if state.get("generation_started_at"):
+            generation_duration.observe(time.time() - state["generation_started_at"], mode=state["generation_mode"])
+    statuses = {f"{platform}_status": "Skipped" for platform in PLATFORMS}
+    posting = [p for p in PLATFORMS if state.get(f"{p}_content")]
+    # Posts are deduplicated per run, so a resumed run does not post twice
+    scope = state.get("run_id") or f"row:{state.get('sheet_row_index')}:{state.get('url')}"
+    results = await asyncio.gather(*(PLATFORM_POSTERS[p](state[f"{p}_content"], scope) for p in posting))
+    statuses.update({f"{platform}_status": result for platform, result in zip(posting, results)})
+
+    failed = [p for p in posting if statuses[f"{p}_status"].startswith("Post failed")]
+    if failed:
+        # Show the failure in the sheet, then fail the run so it keeps its
+        # checkpoints; a resumed run posts again (platforms that went through
+        # are suppressed by the publish log) and overwrites these statuses.
+        result = await write_sheet_row(state, statuses)
+        if result.startswith("Sheet update failed"):
+            print(f"Could not record the failed post in the sheet: {result}")
+        raise RuntimeError("; ".join(f"{p}: {statuses[f'{p}_status']}" for p in failed))
+    return statuses
+
+async def write_sheet_row(state: AgentState, statuses: dict) -> str:
+    """Writes the generated content and the given statuses to the run's sheet row."""
+    update = {
+        "sheet_name": "News Media Links",
+        "link_column": "Media Links",
+        "row_index": state["sheet_row_index"],
     }
+    for platform in PLATFORMS:
+        update[f"{platform}_content"] = state.get(f"{platform}_content")
+        update[f"{platform}_status"] = statuses.get(f"{platform}_status")
+    return await run_blocking(update_google_sheet.invoke, update)
 
-def update_sheet_node(state: AgentState) -> dict:
-    linkedin_content = state.get("linkedin_content")
-    # twitter_content = state.get("twitter_content")
-    linkedin_status = state.get("linkedin_status")
-    # twitter_status = state.get("twitter_status")
+async def update_sheet_node(state: AgentState) -> dict:
     sheet_row_index = state.get("sheet_row_index")
+    contents = {p: state.get(f"{p}_content") for p in PLATFORMS}
 
-    # if not all([sheet_row_index, linkedin_content, twitter_content]):
-    #     # Don't update if data is missing
-    #     return {} 
-    if not all([sheet_row_index, linkedin_content]):
+    if not any(contents.values()):
         # Don't update if data is missing
         return {} 
 
-    update_google_sheet.invoke({
+    if sheet_row_index:
+        result = await write_sheet_row(state, state)
+        if result.startswith("Sheet update failed"):
+            # Fail the run so a resume retries only this node
+            raise RuntimeError(result)
+
+    if DEDUP_ENABLED and state.get("url"):
+        # Only articles that made it all the way are duplicates for later runs
+        await run_blocking(dedup_index.record, state["url"], state.get("article"), sheet_row_index)
+    return {} 
+
+def add_pipeline_nodes(workflow: StateGraph):
+    """Adds the per-article check_url -> update_sheet pipeline to a graph."""
+    workflow.add_node("check_url", agent_node("check_url", check_url_node))
+    workflow.add_node("scrape", agent_node("scrape", scrape_node))
+    workflow.add_node("preprocess", agent_node("preprocess", preprocess_node))
+    workflow.add_node("check_content", agent_node("check_content", check_content_node))
+    workflow.add_node("mark_duplicate", agent_node("mark_duplicate", mark_duplicate_node))
+    workflow.add_node("summarize", agent_node("summarize", summarize_node))
+    workflow.add_node("generate_direct", agent_node("generate_direct", generate_direct_node))
+    for platform in PLATFORMS:
+        workflow.add_node(f"generate_{platform}", agent_node(f"generate_{platform}", make_generate_node(platform)))
+    workflow.add_node("post_content", agent_node("post_content", post_content_node))
+    workflow.add_node("update_sheet", agent_node("update_sheet", update_sheet_node))
+
+    # Duplicates (by URL before scraping, by content after) skip the LLM calls and posting
+    workflow.add_conditional_edges("check_url", route_duplicate("scrape"), {"scrape": "scrape", "mark_duplicate": "mark_duplicate"})
+    workflow.add_edge("scrape", "preprocess")
+    workflow.add_edge("preprocess", "check_content")
+    workflow.add_conditional_edges(
+        "check_content",
+        route_generation,
+        {"summarize": "summarize", "generate_direct": "generate_direct", "mark_duplicate": "mark_duplicate"},
+    )
+    # Direct mode skips summarize and the per-platform nodes unless its answer was unusable
+    workflow.add_conditional_edges("generate_direct", route_direct, {"post_content": "post_content", "summarize": "summarize"})
+    workflow.add_edge("mark_duplicate", END)
+    for platform in PLATFORMS:
+        workflow.add_edge("summarize", f"generate_{platform}")
+    workflow.add_edge([f"generate_{platform}" for platform in PLATFORMS], "post_content")
+    workflow.add_edge("post_content", "update_sheet")
+    workflow.add_edge("update_sheet", END)
+
+# Pipeline for a single, already-known row. Used by the backlog mode.
+pipeline_workflow = StateGraph(AgentState)
+add_pipeline_nodes(pipeline_workflow)
+pipeline_workflow.set_entry_point("check_url")
+pipeline = pipeline_workflow.compile()
+
+def row_run_id(run_id: str, sheet_row_index: int) -> str:
+    """The run id of one row of a backlog run; it must fit in a URL path segment."""
+    return f"{run_id}:{sheet_row_index}"
+
+def _row_result(row_state: AgentState, result) -> dict:
+    row = {"url": row_state["url"], "sheet_row_index": row_state["sheet_row_index"]}
+    if isinstance(result, Exception):
+        return {**row, "status": "failed", "error": str(result), "run_id": row_state.get("run_id")}
+    if result.get("duplicate_of"):
+        return {**row, "status": "duplicate", "duplicate_of": result["duplicate_of"]}
+    if not any(result.get(f"{platform}_content") for platform in PLATFORMS):
+        return {**row, "status": "skipped", "error": "No content generated."}
+    statuses = {f"{platform}_status": result.get(f"{platform}_status") for platform in PLATFORMS}
+    return {**row, "status": "completed", **statuses}
+
+async def backlog_node(state: AgentState) -> dict:
+    print('Fetching unprocessed links')
+    rows = await run_blocking(get_unprocessed_urls.invoke, {
         "sheet_name": "News Media Links",
         "link_column": "Media Links",
-        "row_index": sheet_row_index,
-        "linkedin_content": linkedin_content,
-        # "twitter_content": twitter_content,
-        "linkedin_status": linkedin_status,
-        # "twitter_status": twitter_status
+        "status_columns": STATUS_COLUMNS,
+        "limit": state.get("backlog_limit"),
     })
-
-    return {} 
+    if not rows:
+        return {"batch_results": []}
+
+    max_concurrency = state.get("max_concurrency") or BACKLOG_MAX_CONCURRENCY
+    print(f'Processing {len(rows)} links with concurrency {max_concurrency}')
+    row_states = [{"url": url, "sheet_row_index": row_index, "mode": state.get("mode")} for url, row_index in rows]
+    if state.get("run_id"):
+        # Each row is its own run, so a failed row resumes on its own
+        for row_state in row_states:
+            row_state["run_id"] = row_run_id(state["run_id"], row_state["sheet_row_index"])
+            await run_blocking(checkpoint_store.start, row_state["run_id"], row_state)
+    try:
+        results = await pipeline.abatch(
+            row_states,
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+    finally:
+        # get_unprocessed_urls claimed the rows for this backlog
+        await run_blocking(release_when_written, "News Media Links", [row_index for _, row_index in rows])
+    for row_state, result in zip(row_states, results):
+        if row_state.get("run_id") and not isinstance(result, Exception):
+            await run_blocking(checkpoint_store.finish, row_state["run_id"])
+    batch_results = [_row_result(row_state, result) for row_state, result in zip(row_states, results)]
+    print('Backlog processed')
+    return {"batch_results": batch_results}
 
 workflow = StateGraph(AgentState)
 
 def router_node(state: AgentState):
+    if state.get("backlog"):
+        print('Processing backlog')
+        return {"next": "backlog_path"}
+    if state.get("url") and state.get("sheet_row_index"):
+        # A row that is already in the sheet, e.g. from the sheet watcher
+        return {"next": "row_path"}
     if state.get("url"):
         print('Adding URL to gsheet')
         return {"next": "add_url_path"}
     else:
         return {"next": "fetch_path"}
     
-workflow.add_node("router", router_node)
-workflow.add_node("add_url", add_url_to_sheet_node)
-workflow.add_node("fetch_url", fetch_link_node)
-workflow.add_node("scrape", scrape_node)
-workflow.add_node("summarize", summarize_node)
-workflow.add_node("generate_content", generate_content_node)
-workflow.add_node("post_content", post_content_node)
-workflow.add_node("update_sheet", update_sheet_node)
+workflow.add_node("router", timed_node("agent", "router", router_node))
+workflow.add_node("add_url", agent_node("add_url", add_url_to_sheet_node))
+workflow.add_node("fetch_url", agent_node("fetch_url", fetch_link_node))
+workflow.add_node("backlog", timed_node("agent", "backlog", backlog_node))
+add_pipeline_nodes(workflow)
 
 workflow.set_entry_point("router")
 
@@ -265,18 +435,15 @@ workflow.add_conditional_edges(
     lambda state: state["next"],      
     {
         "add_url_path": "add_url",  
-        "fetch_path": "fetch_url"   
+        "fetch_path": "fetch_url",
+        "backlog_path": "backlog",
+        "row_path": "check_url"
     }
 )
 
-# Connect both paths to the scrape node
-workflow.add_edge("add_url", "scrape")
-workflow.add_edge("fetch_url", "scrape")
-
-workflow.add_edge("scrape", "summarize")
-workflow.add_edge("summarize", "generate_content")
-workflow.add_edge("generate_content", "post_content")
-workflow.add_edge("post_content", "update_sheet")
-workflow.add_edge("update_sheet", END)
+# Connect both paths to the per-article pipeline
+workflow.add_edge("add_url", "check_url")
+workflow.add_edge("fetch_url", "check_url")
+workflow.add_edge("backlog", END)
 
-app = workflow.compile()
+app = workflow.compile()
\ No newline at end of file
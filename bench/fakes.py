@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Dict, List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from gspread.utils import a1_range_to_grid_range
+
+# Local stand-ins for Gemini (OpenAI-compatible), Firecrawl and LinkedIn.
+# Latencies are in seconds and are read from the environment by `bench.run`.
+BENCH_LLM_LATENCY = float(os.getenv("BENCH_LLM_LATENCY", "0.5"))
+BENCH_LLM_TOKEN_INTERVAL = float(os.getenv("BENCH_LLM_TOKEN_INTERVAL", "0.01"))
+BENCH_LLM_WORDS = int(os.getenv("BENCH_LLM_WORDS", "120"))
+# Long tail: this fraction of LLM calls takes BENCH_LLM_SLOW_LATENCY instead
+BENCH_LLM_SLOW_RATE = float(os.getenv("BENCH_LLM_SLOW_RATE", "0"))
+BENCH_LLM_SLOW_LATENCY = float(os.getenv("BENCH_LLM_SLOW_LATENCY", "10"))
+BENCH_LLM_ERROR_RATE = float(os.getenv("BENCH_LLM_ERROR_RATE", "0"))
+# Per-model latency overrides, e.g. "gemini-2.5-flash-lite=0.2,gemini-2.5-pro=2"
+BENCH_LLM_MODEL_LATENCY = {
+    model: float(seconds)
+    for model, _, seconds in (item.partition("=") for item in os.getenv("BENCH_LLM_MODEL_LATENCY", "").split(",") if item)
+}
+BENCH_SCRAPE_LATENCY = float(os.getenv("BENCH_SCRAPE_LATENCY", "0.3"))
+BENCH_ARTICLE_WORDS = int(os.getenv("BENCH_ARTICLE_WORDS", "1500"))
+BENCH_LINKEDIN_LATENCY = float(os.getenv("BENCH_LINKEDIN_LATENCY", "0.2"))
+BENCH_LINKEDIN_ERROR_RATE = float(os.getenv("BENCH_LINKEDIN_ERROR_RATE", "0"))
+# Whether the fake LLM accepts `n` > 1 (multiple candidates per call)
+BENCH_LLM_SUPPORTS_N = os.getenv("BENCH_LLM_SUPPORTS_N", "true").lower() in ("1", "true", "yes")
+
+WORDS = (
+    "market growth data model energy policy startup research team product launch customer revenue "
+    "network platform security cloud funding report analysis design hardware software climate city "
+    "health study survey trend investment partner region quarter forecast supply demand value"
+).split()
+
+def fake_text(seed: str, words: int) -> str:
+    """Deterministic filler text; different seeds give different text."""
+    rng = random.Random(hashlib.sha256(seed.encode("utf-8")).hexdigest())
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+# Navigation, consent banner, share links and footer, as real scrapes include them
+ARTICLE_HEADER = """[Skip to content](#main)
+
+* [Home](https://news.example.com/)
+* [World](https://news.example.com/world)
+* [Business](https://news.example.com/business)
+* [Technology](https://news.example.com/technology)
+
+![Logo](https://news.example.com/logo.png)
+
+We use cookies to improve your experience. [Accept all](#) [Manage settings](#)"""
+
+ARTICLE_FOOTER = """[Share on LinkedIn](https://linkedin.com/share) [Share on X](https://x.com/share)
+
+Subscribe to our newsletter for the latest stories.
+
+* [About us](https://news.example.com/about)
+* [Privacy policy](https://news.example.com/privacy)
+* [Terms of use](https://news.example.com/terms)
+
+© 2025 Example News. All rights reserved."""
+
+def fake_article(url: str, words: int = BENCH_ARTICLE_WORDS) -> str:
+    sections = max(1, words // 300)
+    parts = [ARTICLE_HEADER, f"# Article {url}", f"![Hero image]({url}/hero.jpg)"]
+    for i in range(sections):
+        parts.append(f"## Section {i + 1}")
+        parts.append(fake_text(f"{url}#{i}", words // sections))
+        parts.append(f"Read more: [Related story {i + 1}]({url}/related/{i + 1})")
+    parts.append(ARTICLE_FOOTER)
+    return "\n\n".join(parts)
+
+app = FastAPI(title="Benchmark fakes")
+
+# Emulates Gemini prompt caching: a system prefix seen before, or one stored
+# through /cachedContents, is reported as cached prompt tokens.
+_seen_prefixes = set()
+_cached_contents: Dict[str, str] = {}
+
+@app.get("/")
+async def root():
+    return {"status": "ok"}
+
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    prompt = json.dumps(messages)
+    content = fake_text(prompt, BENCH_LLM_WORDS)
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        # Structured output: one filler string per property of the schema
+        properties = response_format["json_schema"]["schema"].get("properties", {})
+        content = json.dumps({key: fake_text(f"{prompt}:{key}", BENCH_LLM_WORDS) for key in properties})
+
+    handle = body.get("extra_body", {}).get("google", {}).get("cached_content")
+    prefix = _cached_contents.get(handle, "")
+    if not prefix and messages and messages[0].get("role") == "system":
+        if messages[0]["content"] in _seen_prefixes:
+            prefix = messages[0]["content"]
+        _seen_prefixes.add(messages[0]["content"])
+    prompt_tokens = (len(prompt) + (len(prefix) if handle else 0)) // 4
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(content) // 4,
+        "total_tokens": prompt_tokens + len(content) // 4,
+        "prompt_tokens_details": {"cached_tokens": len(prefix) // 4},
+    }
+    completion_id = f"chatcmpl-{hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:12]}"
+    model = body.get("model", "fake")
+    n = body.get("n") or 1
+    if n > 1 and not BENCH_LLM_SUPPORTS_N:
+        return JSONResponse({"error": {"message": "n > 1 is not supported", "code": 400}}, status_code=400)
+    if BENCH_LLM_ERROR_RATE and random.random() < BENCH_LLM_ERROR_RATE:
+        return JSONResponse({"error": {"message": "Service unavailable", "code": 503}}, status_code=503)
+    slow = BENCH_LLM_SLOW_RATE and random.random() < BENCH_LLM_SLOW_RATE
+    await asyncio.sleep(BENCH_LLM_SLOW_LATENCY if slow else BENCH_LLM_MODEL_LATENCY.get(model, BENCH_LLM_LATENCY))
+
+    if not body.get("stream"):
+        contents = [content] + [fake_text(f"{prompt}#{i}", BENCH_LLM_WORDS) for i in range(1, n)]
+        usage["completion_tokens"] = sum(len(c) // 4 for c in contents)
+        usage["total_tokens"] = prompt_tokens + usage["completion_tokens"]
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"index": i, "finish_reason": "stop", "message": {"role": "assistant", "content": c}}
+                for i, c in enumerate(contents)
+            ],
+            "usage": usage,
+        }
+
+    async def events():
+        for i, word in enumerate(content.split(" ")):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(BENCH_LLM_TOKEN_INTERVAL)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/cachedContents")
+async def cached_contents(request: Request):
+    body = await request.json()
+    text = body["systemInstruction"]["parts"][0]["text"]
+    name = f"cachedContents/{hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]}"
+    _cached_contents[name] = text
+    return {"name": name, "model": body.get("model")}
+
+@app.post("/v2/scrape")
+async def scrape(request: Request):
+    body = await request.json()
+    url = body.get("url", "")
+    await asyncio.sleep(BENCH_SCRAPE_LATENCY)
+    return {
+        "success": True,
+        "data": {
+            "markdown": fake_article(url),
+            "metadata": {"title": f"Article {url}", "sourceURL": url, "statusCode": 200},
+        },
+    }
+
+_post_ids = iter(range(1, 1 << 62))
+
+@app.post("/v2/ugcPosts")
+async def ugc_posts(request: Request):
+    await request.body()
+    await asyncio.sleep(BENCH_LINKEDIN_LATENCY)
+    if BENCH_LINKEDIN_ERROR_RATE and random.random() < BENCH_LINKEDIN_ERROR_RATE:
+        return JSONResponse({"message": "Service unavailable"}, status_code=503)
+    return JSONResponse({"id": f"urn:li:share:{next(_post_ids)}"}, status_code=201)
+
+HEADERS = ["Media Links", "LinkedIn Content", "LinkedIn Status", "Twitter Content", "Twitter Status"]
+
+class MemoryWorksheet:
+    """In-memory stand-in for the subset of gspread.Worksheet the app uses."""
+
+    def __init__(self, title: str, headers: List[str] = HEADERS):
+        self.title = title
+        self.id = 0
+        self.spreadsheet_id = f"memory:{title}"
+        self.rows: List[List[str]] = [list(headers)]
+        self._lock = threading.Lock()
+
+    def _set(self, row: int, col: int, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        cells.extend([""] * (col - len(cells)))
+        cells[col - 1] = "" if value is None else str(value)
+
+    def row_values(self, row: int) -> List[str]:
+        with self._lock:
+            return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def col_values(self, col: int) -> List[str]:
+        with self._lock:
+            values = [row[col - 1] if col <= len(row) else "" for row in self.rows]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def get_all_values(self) -> List[List[str]]:
+        with self._lock:
+            width = max(len(row) for row in self.rows)
+            return [row + [""] * (width - len(row)) for row in self.rows]
+
+    def batch_get(self, ranges: List[str], **kwargs) -> List[List[List[str]]]:
+        results = []
+        with self._lock:
+            for a1 in ranges:
+                grid = a1_range_to_grid_range(a1.split("!")[-1])
+                rows = self.rows[grid.get("startRowIndex", 0):grid.get("endRowIndex")]
+                values = [
+                    [cell for cell in row[grid.get("startColumnIndex", 0):grid.get("endColumnIndex")]]
+                    for row in rows
+                ]
+                # Like the Sheets API, trailing empty cells and rows are left out
+                for row in values:
+                    while row and not row[-1]:
+                        row.pop()
+                while values and not values[-1]:
+                    values.pop()
+                results.append(values)
+        return results
+
+    def append_row(self, values: List[str], value_input_option=None, **kwargs) -> dict:
+        with self._lock:
+            self.rows.append([str(v) for v in values])
+            row = len(self.rows)
+        return {"updates": {"updatedRange": f"{self.title}!A{row}:A{row}"}}
+
+    def batch_update(self, data: List[dict], value_input_option=None, **kwargs):
+        with self._lock:
+            for update in data:
+                grid = a1_range_to_grid_range(update["range"].split("!")[-1])
+                for i, values in enumerate(update["values"]):
+                    for j, value in enumerate(values):
+                        self._set(grid["startRowIndex"] + 1 + i, grid["startColumnIndex"] + 1 + j, value)
+
+class MemorySpreadsheet:
+    def __init__(self, title: str):
+        self.sheet1 = MemoryWorksheet(title)
+
+class MemorySheetsClient:
+    """In-memory stand-in for gspread.Client; every spreadsheet starts with just a header row."""
+
+    def __init__(self):
+        self.spreadsheets: Dict[str, MemorySpreadsheet] = {}
+        self._lock = threading.Lock()
+
+    def open(self, title: str) -> MemorySpreadsheet:
+        with self._lock:
+            return self.spreadsheets.setdefault(title, MemorySpreadsheet(title))
+
+    def open_by_key(self, key: str) -> MemorySpreadsheet:
+        return self.open(key)
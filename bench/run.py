@@ -0,0 +1,284 @@
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Callable, List, Optional
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("generate", "generate-bulk", "post", "run-agent")
+# A week of topics with three angles each, per /generate/bulk request
+BULK_ITEMS = 7
+BULK_VARIANTS = 3
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def rss_kb(pid: int) -> Optional[int]:
+    """Current resident set size of a process in KB (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+class MemorySampler:
+    """Samples a process's RSS in the background and keeps the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = rss_kb(pid)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            current = rss_kb(self.pid)
+            if current is not None:
+                self.peak_kb = max(self.peak_kb or 0, current)
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+def app_env(args, fake_url: str, data_dir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT,
+        "GOOGLE_API_KEY": "bench",
+        "GEMINI_BASE_URL": f"{fake_url}/",
+        "FIRECRAWL_API_KEY": "bench",
+        "FIRECRAWL_API_URL": fake_url,
+        "LINKEDIN_API_URL": f"{fake_url}/v2/ugcPosts",
+        "LINKEDIN_ACCESS_TOKEN": "bench",
+        "LINKEDIN_COMPANY_ID": "bench",
+        "LINKEDIN_PERSON_URN": "bench",
+        # The real rate limits would dominate every run
+        "LINKEDIN_POSTS_PER_MINUTE": "1000000000",
+        "LINKEDIN_BURST": "1000000",
+        "AGENT_PLATFORMS": "linkedin",
+        "LLM_CACHE_BACKEND": "none",
+        "LLM_CACHE_PATH": os.path.join(data_dir, "llm.sqlite"),
+        "SCRAPE_CACHE_PATH": os.path.join(data_dir, "scrape.sqlite"),
+        "PUBLISH_LOG_PATH": os.path.join(data_dir, "published.sqlite"),
+        "DEDUP_PATH": os.path.join(data_dir, "dedup.sqlite"),
+        "CONVERSATION_STORE_PATH": os.path.join(data_dir, "conversations.sqlite"),
+        "SHEET_CURSOR_PATH": os.path.join(data_dir, "sheet_cursor.sqlite"),
+        "CHECKPOINT_PATH": os.path.join(data_dir, "checkpoints.sqlite"),
+        "BLOB_STORE_PATH": os.path.join(data_dir, "blobs.sqlite"),
+    })
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+def fake_env(args) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT,
+        "BENCH_LLM_LATENCY": str(args.llm_latency),
+        "BENCH_LLM_TOKEN_INTERVAL": str(args.llm_token_interval),
+        "BENCH_LLM_SLOW_RATE": str(args.llm_slow_rate),
+        "BENCH_LLM_SLOW_LATENCY": str(args.llm_slow_latency),
+        "BENCH_LLM_ERROR_RATE": str(args.llm_error_rate),
+        "BENCH_LLM_MODEL_LATENCY": ",".join(args.llm_model_latency),
+        "BENCH_SCRAPE_LATENCY": str(args.scrape_latency),
+        "BENCH_ARTICLE_WORDS": str(args.article_words),
+        "BENCH_LINKEDIN_LATENCY": str(args.linkedin_latency),
+        "BENCH_LINKEDIN_ERROR_RATE": str(args.linkedin_error_rate),
+        "BENCH_LLM_SUPPORTS_N": str(not args.llm_no_n).lower(),
+    })
+    return env
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in {timeout}s")
+
+async def wait_warm(url: str, timeout: float = 120) -> dict:
+    """Waits until the app has loaded its graphs in the background, so they are not part of the first samples."""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            report = (await client.get(url)).json()
+            if report.get("warm_seconds") is not None:
+                return report
+            await asyncio.sleep(0.2)
+    return report
+
+async def drive(client: httpx.AsyncClient, requests: int, concurrency: int, send: Callable) -> dict:
+    """Runs `requests` calls of send(client, i) with `concurrency` in flight."""
+    latencies, errors = [], []
+    indexes = iter(range(requests))
+
+    async def worker():
+        for i in indexes:
+            start = time.perf_counter()
+            try:
+                response = await send(client, i)
+                if response.is_error:
+                    errors.append(f"HTTP {response.status_code}")
+            except Exception as e:
+                errors.append(type(e).__name__)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "error_kinds": sorted(set(errors)),
+        "seconds": round(elapsed, 3),
+        "throughput": round(requests / elapsed, 2) if elapsed else 0.0,
+        "p50": round(percentile(latencies, 50), 4),
+        "p95": round(percentile(latencies, 95), 4),
+        "p99": round(percentile(latencies, 99), 4),
+        "max": round(max(latencies, default=0.0), 4),
+    }
+
+async def run_scenario(name: str, client: httpx.AsyncClient, args, run_id: str) -> dict:
+    if name == "generate":
+        async def send(client, i):
+            return await client.post("/generate", json={"user_context": f"Benchmark topic {run_id}-{i}"})
+        return await drive(client, args.requests, args.concurrency, send)
+
+    if name == "generate-bulk":
+        async def send(client, i):
+            return await client.post("/generate/bulk", json={
+                "user_contexts": [f"Benchmark topic {run_id}-{i}-{day}" for day in range(BULK_ITEMS)],
+                "variants": BULK_VARIANTS,
+            })
+        return await drive(client, args.requests, args.concurrency, send)
+
+    if name == "post":
+        # Drafts are created first (untimed) so only the approval step is measured
+        drafts = []
+        async def create(client, i):
+            response = await client.post("/generate", json={"user_context": f"Benchmark post {run_id}-{i}"})
+            if response.status_code == 200:
+                drafts.append(response.json()["conversation_id"])
+            return response
+        await drive(client, args.requests, args.concurrency, create)
+
+        async def send(client, i):
+            return await client.post("/post", json={
+                "conversation_id": drafts[i],
+                "final_script": f"Benchmark post {run_id}-{i}",
+                "user_approval": True,
+            })
+        return await drive(client, len(drafts), args.concurrency, send)
+
+    if name == "run-agent":
+        async def send(client, i):
+            return await client.post("/run-agent", json={"url": f"https://example.com/articles/{run_id}-{i}", "wait": True})
+        return await drive(client, args.requests, args.concurrency, send)
+
+    raise ValueError(f"Unknown scenario: {name}")
+
+def report(results: dict) -> str:
+    columns = ["scenario", "requests", "errors", "seconds", "throughput", "p50", "p95", "p99", "max", "peak_rss_mb"]
+    rows = [columns] + [[name] + [str(result.get(c, "")) for c in columns[1:]] for name, result in results.items()]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows)
+
+async def main(args):
+    run_id = uuid.uuid4().hex[:8]
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    output = None if args.verbose else subprocess.DEVNULL
+    processes = []
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as data_dir:
+        try:
+            fakes = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "bench.fakes:app", "--port", str(args.fake_port), "--log-level", "warning"],
+                cwd=ROOT, env=fake_env(args), stdout=output, stderr=output,
+            )
+            processes.append(fakes)
+            server = subprocess.Popen(
+                [sys.executable, "-m", "bench.serve", "--port", str(args.app_port)],
+                cwd=ROOT, env=app_env(args, fake_url, data_dir), stdout=output, stderr=output,
+            )
+            processes.append(server)
+            await wait_ready(f"{fake_url}/", fakes)
+            await wait_ready(f"{app_url}/", server)
+            startup = await wait_warm(f"{app_url}/startup")
+            print(f"App ready in {startup['ready_seconds']}s, graphs loaded at {startup['warm_seconds']}s")
+
+            results = {}
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=args.timeout) as client:
+                for name in args.scenarios:
+                    print(f"Running {name}: {args.requests} requests at concurrency {args.concurrency}...")
+                    with MemorySampler(server.pid) as sampler:
+                        result = await run_scenario(name, client, args, run_id)
+                    result["peak_rss_mb"] = round(sampler.peak_kb / 1024, 1) if sampler.peak_kb else None
+                    results[name] = result
+                if args.metrics:
+                    print((await client.get("/metrics")).text)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    print(report(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"run_id": run_id, "config": vars(args), "results": results}, f, indent=2)
+        print(f"Wrote {args.json}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test main:app against local fakes of every external service.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight at once.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds before the fake LLM answers.")
+    parser.add_argument("--llm-token-interval", type=float, default=0.01, help="Seconds between streamed tokens.")
+    parser.add_argument("--llm-slow-rate", type=float, default=0.0, help="Fraction of LLM calls that take --llm-slow-latency.")
+    parser.add_argument("--llm-slow-latency", type=float, default=10.0, help="Seconds for a slow (long-tail) LLM call.")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of LLM calls that return 503.")
+    parser.add_argument("--llm-model-latency", action="append", default=[], metavar="MODEL=SECONDS", help="Latency of one model, e.g. gemini-2.5-flash-lite=0.2.")
+    parser.add_argument("--scrape-latency", type=float, default=0.3, help="Seconds per fake Firecrawl scrape.")
+    parser.add_argument("--article-words", type=int, default=1500, help="Length of fake scraped articles.")
+    parser.add_argument("--linkedin-latency", type=float, default=0.2, help="Seconds per fake LinkedIn post.")
+    parser.add_argument("--linkedin-error-rate", type=float, default=0.0, help="Fraction of LinkedIn posts that return 503.")
+    parser.add_argument("--llm-no-n", action="store_true", help="Make the fake LLM reject n > 1, to exercise the per-variant fallback.")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra environment for the app, e.g. AGENT_WORKERS=16.")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--fake-port", type=int, default=8101)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    parser.add_argument("--metrics", action="store_true", help="Print the app's /metrics after the run.")
+    parser.add_argument("--verbose", action="store_true", help="Show the app and fake server output.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,16 @@
+import argparse
+import uvicorn
+import sheets
+from bench.fakes import MemorySheetsClient
+
+# Runs the API from main.py with Google Sheets replaced by an in-memory sheet.
+# Every other external service is pointed at bench.fakes through the environment.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve main:app against an in-memory Google Sheet.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    sheets.set_client(MemorySheetsClient())
+    from main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
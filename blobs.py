@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", ".cache/blobs.sqlite")
+# Blobs outlive the checkpoints that reference them, so resumed runs find them
+BLOB_STORE_TTL = float(os.getenv("BLOB_STORE_TTL", str(7 * 24 * 60 * 60)))
+
+class BlobStore:
+    """
+    On-disk store for large values (e.g. Firecrawl scrapes) that agent runs
+    pass around by id instead of by value. Values are stored as compressed
+    JSON under the hash of their content, so the same scrape is stored once.
+    Entries expire `ttl` seconds after they were last written.
+    """
+
+    def __init__(self, path: str = BLOB_STORE_PATH, ttl: float = BLOB_STORE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    blob_id TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+        return self._conn
+
+    def put(self, value: Any) -> str:
+        """Stores a JSON-serializable value and returns its id."""
+        data = json.dumps(value, default=str, sort_keys=True).encode("utf-8")
+        blob_id = hashlib.sha256(data).hexdigest()
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM blobs WHERE created_at <= ?", (now - self.ttl,))
+            conn.execute(
+                """
+                INSERT INTO blobs (blob_id, data, size, created_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(blob_id) DO UPDATE SET created_at = excluded.created_at
+                """,
+                (blob_id, zlib.compress(data), len(data), now),
+            )
+            conn.commit()
+        return blob_id
+
+    def get(self, blob_id: str) -> Optional[Any]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT data, created_at FROM blobs WHERE blob_id = ?", (blob_id,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+        return {"entries": entries, "bytes": size}
+
+blob_store = BlobStore()
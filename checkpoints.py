@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import sqlite3
+import functools
+import threading
+from typing import List, Optional
+from dotenv import load_dotenv
+from clients import run_blocking
+from metrics import checkpoint_replays
+
+load_dotenv()
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() in ("1", "true", "yes")
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", ".cache/checkpoints.sqlite")
+# Runs that never complete (and are never resumed) are dropped after this long
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", str(7 * 24 * 60 * 60)))
+
+class CheckpointStore:
+    """
+    SQLite store of agent runs and the output of every node they finished,
+    keyed by run id. Resuming a run replays the saved outputs and only runs
+    the nodes after the last successful one. A run's rows are deleted once it
+    completes.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, ttl: float = CHECKPOINT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    sheet_row_index INTEGER,
+                    initial_state TEXT,
+                    last_node TEXT,
+                    failed_node TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS runs_sheet_row_index ON runs (sheet_row_index)")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    run_id TEXT NOT NULL,
+                    node TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, node)
+                )
+                """
+            )
+        return self._conn
+
+    def start(self, run_id: str, initial_state: dict):
+        """Records a run and the state it started from, so it can be resumed later."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            self._prune(conn, now)
+            conn.execute(
+                """
+                INSERT INTO runs (run_id, sheet_row_index, initial_state, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(run_id) DO UPDATE SET initial_state = excluded.initial_state, updated_at = excluded.updated_at
+                """,
+                (run_id, initial_state.get("sheet_row_index"), json.dumps(initial_state, default=str), now, now),
+            )
+            conn.commit()
+
+    def load(self, run_id: str, node: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT output FROM checkpoints WHERE run_id = ? AND node = ?", (run_id, node)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, run_id: str, node: str, output: dict, sheet_row_index: Optional[int] = None):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (run_id, node, output, created_at) VALUES (?, ?, ?, ?)",
+                (run_id, node, json.dumps(output, default=str), now),
+            )
+            conn.execute(
+                """
+                INSERT INTO runs (run_id, sheet_row_index, last_node, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(run_id) DO UPDATE SET
+                    sheet_row_index = COALESCE(excluded.sheet_row_index, runs.sheet_row_index),
+                    last_node = excluded.last_node,
+                    failed_node = NULL,
+                    error = NULL,
+                    updated_at = excluded.updated_at
+                """,
+                (run_id, sheet_row_index, node, now, now),
+            )
+            conn.commit()
+
+    def fail(self, run_id: str, node: str, error: str):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE runs SET failed_node = ?, error = ?, updated_at = ? WHERE run_id = ?",
+                (node, error, time.time(), run_id),
+            )
+            conn.commit()
+
+    def finish(self, run_id: str):
+        """Deletes a completed run and its checkpoints."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+            conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            conn.commit()
+
+    def _run(self, row) -> dict:
+        run_id, sheet_row_index, initial_state, last_node, failed_node, error, created_at, updated_at = row
+        nodes = [
+            node for (node,) in self._connection().execute(
+                "SELECT node FROM checkpoints WHERE run_id = ? ORDER BY created_at", (run_id,)
+            )
+        ]
+        return {
+            "run_id": run_id,
+            "sheet_row_index": sheet_row_index,
+            "initial_state": json.loads(initial_state) if initial_state else None,
+            "last_node": last_node,
+            "failed_node": failed_node,
+            "error": error,
+            "checkpointed_nodes": nodes,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def get(self, run_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connection().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            return self._run(row) if row else None
+
+    def find(self, sheet_row_index: int) -> Optional[dict]:
+        """The most recent unfinished run for a sheet row."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT * FROM runs WHERE sheet_row_index = ? ORDER BY updated_at DESC LIMIT 1", (sheet_row_index,)
+            ).fetchone()
+            return self._run(row) if row else None
+
+    def list(self, limit: int = 100) -> List[dict]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT * FROM runs ORDER BY updated_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+            return [self._run(row) for row in rows]
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        cutoff = now - self.ttl
+        conn.execute("DELETE FROM checkpoints WHERE run_id IN (SELECT run_id FROM runs WHERE updated_at <= ?)", (cutoff,))
+        conn.execute("DELETE FROM runs WHERE updated_at <= ?", (cutoff,))
+
+checkpoint_store = CheckpointStore()
+
+def checkpointed(name: str, fn):
+    """
+    Wraps an async graph node. When the state carries a run_id, the node's
+    output is saved after it succeeds, and a saved output is returned instead
+    of running the node again.
+    """
+    @functools.wraps(fn)
+    async def node(state, *args, **kwargs):
+        run_id = state.get("run_id") if CHECKPOINT_ENABLED else None
+        if not run_id:
+            return await fn(state, *args, **kwargs)
+        saved = await run_blocking(checkpoint_store.load, run_id, name)
+        if saved is not None:
+            print(f"Replaying {name} from checkpoint of run {run_id}")
+            checkpoint_replays.inc(node=name)
+            return saved
+        try:
+            output = await fn(state, *args, **kwargs)
+        except Exception as e:
+            await run_blocking(checkpoint_store.fail, run_id, name, str(e))
+            raise
+        sheet_row_index = (output or {}).get("sheet_row_index") or state.get("sheet_row_index")
+        await run_blocking(checkpoint_store.save, run_id, name, output or {}, sheet_row_index)
+        return output
+    return node
@@ -25,12 +25,32 @@ const LinkToContent = () => {
                 body: JSON.stringify({ url }),
             });
 
-            if (response.ok) {
-                const data = await response.json();
-                setMessage(data.message || 'Content posted successfully!');
-            } else {
+            if (!response.ok) {
                 const errorData = await response.json();
                 setMessage(errorData.detail || 'Failed to post content. Please try again.');
+                return;
+            }
+
+            // The agent runs in the background; poll the job until it finishes
+            const { job_id } = await response.json();
+            while (true) {
+                await new Promise((resolve) => setTimeout(resolve, 2000));
+                const jobResponse = await fetch(`http://127.0.0.1:8000/jobs/${job_id}`);
+                const job = await jobResponse.json();
+
+                if (!jobResponse.ok) {
+                    setMessage(job.detail || 'Failed to post content. Please try again.');
+                    break;
+                }
+                if (job.status === 'completed') {
+                    setMessage('Content posted successfully!');
+                    break;
+                }
+                if (job.status === 'failed') {
+                    setMessage(job.error || 'Failed to post content. Please try again.');
+                    break;
+                }
+                setMessage(job.last_node ? `Running... (finished ${job.last_node})` : 'Queued...');
             }
         } catch (error) {
             setMessage('An error occurred. Please check your network and try again.');
@@ -29,18 +29,19 @@ const Footer = () => {
 
 const Post = () => {
   const [scriptContext, setScriptContext] = useState("");
-  const [generatedContent, setGeneratedContent] = useState(null);
+  const [generatedContent, setGeneratedContent] = useState<string | null>(null);
   const [postStatus, setPostStatus] = useState("");
   const [postLink, setPostLink] = useState("");
-  const [conversationId, setConversationId] = useState(null);
+  const [conversationId, setConversationId] = useState<string | null>(null);
 
   const handleGenerate = async () => {
     setGeneratedContent(null);
     setPostStatus("Generating...");
     setPostLink("");
+    setConversationId(null);
 
     try {
-      const response = await fetch("http://localhost:8000/generate", {
+      const response = await fetch("http://localhost:8000/generate/stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -48,13 +49,40 @@ const Post = () => {
         body: JSON.stringify({ user_context: scriptContext }),
       });
 
-      const data = await response.json();
-      if (response.ok) {
-        setPostStatus(data.status);
-        setGeneratedContent(data.result);
-        setConversationId(data.conversation_id);
-      } else {
+      if (!response.ok || !response.body) {
+        const data = await response.json();
         setPostStatus(data.detail || "Failed to generate script.");
+        return;
+      }
+
+      // Server-sent events: "start", one "token" per delta, then "done" or "error"
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let draft = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split("\n\n");
+        buffer = events.pop() || "";
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || "{}");
+
+          if (event === "token") {
+            draft += data.token;
+            setGeneratedContent(draft);
+          } else if (event === "done") {
+            setGeneratedContent(data.result);
+            setConversationId(data.conversation_id);
+            setPostStatus(data.status);
+          } else if (event === "error") {
+            setPostStatus(data.detail || "Failed to generate script.");
+          }
+        }
       }
     } catch (error) {
       console.error("Error submitting form:", error);
@@ -275,7 +303,7 @@ const Post = () => {
                 <button
                   onClick={handleApprove}
                   className="btn btn-primary"
-                  disabled={!generatedContent}
+                  disabled={!generatedContent || !conversationId}
                 >
                   Approve & Post
                 </button>
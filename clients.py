@@ -0,0 +1,48 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+# Blocking SDKs (gspread, Firecrawl, tweepy) run here instead of on the event loop
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "16"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io")
+    return _executor
+
+async def run_blocking(fn, *args, **kwargs):
+    """Runs a blocking call on the bounded I/O executor and awaits the result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(fn, *args, **kwargs))
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared keep-alive HTTP client used for LinkedIn and Twitter."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            timeout=HTTP_TIMEOUT,
+        )
+    return _http_client
+
+async def close():
+    """Closes the HTTP pool and the blocking executor."""
+    global _http_client, _executor
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory")
+CONVERSATION_MAX_SIZE = int(os.getenv("CONVERSATION_MAX_SIZE", "1000"))
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", str(24 * 60 * 60)))
+CONVERSATION_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", ".cache/conversations.sqlite")
+
+class ConversationStore(ABC):
+    """
+    Dict-like store of draft conversations awaiting approval.
+    Entries expire after `ttl` seconds and the store never holds more than
+    `max_size` entries; the least recently used are evicted first.
+    """
+
+    def __init__(self, max_size: int = CONVERSATION_MAX_SIZE, ttl: float = CONVERSATION_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, conversation_id: str, default=None) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def set(self, conversation_id: str, state: dict):
+        ...
+
+    @abstractmethod
+    def pop(self, conversation_id: str, default=None) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def __getitem__(self, conversation_id: str) -> dict:
+        state = self.get(conversation_id)
+        if state is None:
+            raise KeyError(conversation_id)
+        return state
+
+    def __setitem__(self, conversation_id: str, state: dict):
+        self.set(conversation_id, state)
+
+    def __delitem__(self, conversation_id: str):
+        if self.pop(conversation_id) is None:
+            raise KeyError(conversation_id)
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return self.get(conversation_id) is not None
+
+class MemoryConversationStore(ConversationStore):
+    """In-process LRU store. Only visible to the worker that created the draft."""
+
+    def __init__(self, max_size: int = CONVERSATION_MAX_SIZE, ttl: float = CONVERSATION_TTL):
+        super().__init__(max_size, ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now: float):
+        for conversation_id, (expires_at, _) in list(self._entries.items()):
+            if expires_at <= now:
+                del self._entries[conversation_id]
+
+    def get(self, conversation_id: str, default=None) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return default
+            if entry[0] <= time.time():
+                del self._entries[conversation_id]
+                return default
+            self._entries.move_to_end(conversation_id)
+            return entry[1]
+
+    def set(self, conversation_id: str, state: dict):
+        now = time.time()
+        with self._lock:
+            self._entries[conversation_id] = (now + self.ttl, state)
+            self._entries.move_to_end(conversation_id)
+            if len(self._entries) > self.max_size:
+                self._purge_expired(now)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, conversation_id: str, default=None) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.pop(conversation_id, None)
+        if entry is None or entry[0] <= time.time():
+            return default
+        return entry[1]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge_expired(time.time())
+            return len(self._entries)
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Store backed by a local SQLite file, so every uvicorn worker on the host
+    can serve /generate and /post for the same conversation.
+    """
+
+    def __init__(self, path: str = CONVERSATION_STORE_PATH, max_size: int = CONVERSATION_MAX_SIZE, ttl: float = CONVERSATION_TTL):
+        super().__init__(max_size, ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS conversations_accessed_at ON conversations (accessed_at)")
+
+    def get(self, conversation_id: str, default=None) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM conversations WHERE id = ? AND expires_at > ?", (conversation_id, now)
+            ).fetchone()
+            if row is None:
+                return default
+            self._conn.execute("UPDATE conversations SET accessed_at = ? WHERE id = ?", (now, conversation_id))
+        return json.loads(row[0])
+
+    def set(self, conversation_id: str, state: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO conversations (id, state, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (conversation_id, json.dumps(state, default=str), now + self.ttl, now),
+                )
+                self._conn.execute("DELETE FROM conversations WHERE expires_at <= ?", (now,))
+                self._conn.execute(
+                    """
+                    DELETE FROM conversations WHERE id IN (
+                        SELECT id FROM conversations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_size,),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def pop(self, conversation_id: str, default=None) -> Optional[dict]:
+        # Read and delete in one write transaction so two workers cannot both claim a draft
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT state, expires_at FROM conversations WHERE id = ?", (conversation_id,)
+                ).fetchone()
+                self._conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None or row[1] <= time.time():
+            return default
+        return json.loads(row[0])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM conversations WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+
+def make_conversation_store(name: str = CONVERSATION_STORE) -> ConversationStore:
+    if name == "memory":
+        return MemoryConversationStore()
+    if name == "sqlite":
+        return SQLiteConversationStore()
+    raise ValueError(f"Unknown CONVERSATION_STORE: {name}")
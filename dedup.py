@@ -0,0 +1,156 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional
+from dotenv import load_dotenv
+from urls import canonicalize_url
+
+load_dotenv()
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_PATH = os.getenv("DEDUP_PATH", ".cache/dedup.sqlite")
+DEDUP_TTL = float(os.getenv("DEDUP_TTL", str(30 * 24 * 60 * 60)))
+# Articles whose 64-bit SimHash differs in at most this many bits are duplicates (max 3)
+DEDUP_MAX_DISTANCE = min(3, int(os.getenv("DEDUP_MAX_DISTANCE", "3")))
+# Shorter texts (paywalls, error pages) are not fingerprinted
+DEDUP_MIN_WORDS = int(os.getenv("DEDUP_MIN_WORDS", "50"))
+
+SHINGLE_SIZE = 3
+BANDS = 4
+BAND_BITS = 64 // BANDS
+
+def simhash(text: str) -> Optional[int]:
+    """
+    64-bit SimHash over word 3-shingles. Near-identical texts get fingerprints
+    that differ in only a few bits. Returns None for texts that are too short.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < DEDUP_MIN_WORDS:
+        return None
+    weights = [0] * 64
+    for i in range(len(words) - SHINGLE_SIZE + 1):
+        shingle = " ".join(words[i:i + SHINGLE_SIZE])
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+def _bands(fingerprint: int) -> list:
+    mask = (1 << BAND_BITS) - 1
+    return [fingerprint >> (i * BAND_BITS) & mask for i in range(BANDS)]
+
+def _signed(fingerprint: int) -> int:
+    # SQLite integers are signed 64-bit
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+def _distance(a: int, b: int) -> int:
+    return bin((a ^ b) & ((1 << 64) - 1)).count("1")
+
+class DedupIndex:
+    """
+    Index of articles already picked up by the agent, by canonical URL and by
+    SimHash of the scraped text. Fingerprints are split into four 16-bit bands;
+    two fingerprints within 3 bits of each other always share a band, so only
+    rows with a matching band are compared.
+
+    Articles are only recorded once they were posted, so a run that fails
+    (scrape, generation or post) does not block the article. A match on the
+    same sheet row is not a duplicate, so retrying a row works.
+    """
+
+    def __init__(self, path: str = DEDUP_PATH, ttl: float = DEDUP_TTL, max_distance: int = DEDUP_MAX_DISTANCE):
+        self.path = path
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS articles (
+                    url TEXT PRIMARY KEY,
+                    sheet_row_index INTEGER,
+                    fingerprint INTEGER,
+                    b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            for band in range(BANDS):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS articles_b{band} ON articles (b{band})")
+        return self._conn
+
+    def _transaction(self, fn):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+                conn.execute("COMMIT")
+                return result
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def check_url(self, url: str, sheet_row_index: Optional[int] = None) -> Optional[dict]:
+        """Returns the earlier posted article with the same canonical URL, or None."""
+        key = canonicalize_url(url)
+
+        def check(conn):
+            conn.execute("DELETE FROM articles WHERE created_at <= ?", (time.time() - self.ttl,))
+            row = conn.execute("SELECT url, sheet_row_index FROM articles WHERE url = ?", (key,)).fetchone()
+            if row is not None and (row[1] is None or row[1] != sheet_row_index):
+                return {"url": row[0], "sheet_row_index": row[1], "match": "url"}
+            return None
+
+        return self._transaction(check)
+
+    def check_content(self, url: str, text: str, sheet_row_index: Optional[int] = None) -> Optional[dict]:
+        """Returns an earlier posted article whose text is a near-duplicate of `text`, or None."""
+        fingerprint = simhash(text)
+        if fingerprint is None:
+            return None
+        key = canonicalize_url(url)
+        bands = _bands(fingerprint)
+
+        with self._lock:
+            candidates = self._connection().execute(
+                "SELECT url, sheet_row_index, fingerprint FROM articles "
+                "WHERE (b0 = ? OR b1 = ? OR b2 = ? OR b3 = ?) AND url != ? AND created_at > ?",
+                (*bands, key, time.time() - self.ttl),
+            ).fetchall()
+        for other_url, other_row, other in candidates:
+            if other_row is not None and other_row == sheet_row_index:
+                continue
+            distance = _distance(fingerprint, other)
+            if distance <= self.max_distance:
+                return {"url": other_url, "sheet_row_index": other_row, "match": "content", "distance": distance}
+        return None
+
+    def record(self, url: str, text: Optional[str] = None, sheet_row_index: Optional[int] = None):
+        """Records a posted article by canonical URL and, for long enough texts, by fingerprint."""
+        fingerprint = simhash(text) if text else None
+        bands = _bands(fingerprint) if fingerprint is not None else [None] * BANDS
+        self._transaction(lambda conn: conn.execute(
+            """
+            INSERT OR REPLACE INTO articles (url, sheet_row_index, fingerprint, b0, b1, b2, b3, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                canonicalize_url(url), sheet_row_index,
+                _signed(fingerprint) if fingerprint is not None else None, *bands, time.time(),
+            ),
+        ))
+
+    def clear(self):
+        self._transaction(lambda conn: conn.execute("DELETE FROM articles"))
+
+dedup_index = DedupIndex()
@@ -1,16 +1,36 @@
+import re
+import asyncio
 from dotenv import load_dotenv
-from typing import TypedDict
-from openai import OpenAI
+from typing import List, Optional, TypedDict
+from openai import AsyncOpenAI, BadRequestError
+from llm_cache import CachedOpenAIClient
+from resilience import LLM_TIMEOUT
+from router import input_tokens, model_router
+from metrics import timed_node
+from prompts import DRAFT_PROMPT
 import os
 from langgraph.graph import StateGraph, END
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-
-client = OpenAI(
-    api_key=GOOGLE_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/"
-)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/")
+# Bulk drafts: contexts generated at once, and whether to ask for all variants
+# of a context in one call with the `n` parameter
+GENERATE_BULK_CONCURRENCY = int(os.getenv("GENERATE_BULK_CONCURRENCY", "8"))
+GENERATE_USE_N = os.getenv("GENERATE_USE_N", "true").lower() in ("1", "true", "yes")
+
+_client = None
+
+def get_client() -> CachedOpenAIClient:
+    """Returns the shared client for drafts."""
+    global _client
+    if _client is None:
+        _client = CachedOpenAIClient(AsyncOpenAI(
+            api_key=GOOGLE_API_KEY,
+            base_url=GEMINI_BASE_URL,
+            timeout=LLM_TIMEOUT
+        ))
+    return _client
 
 class GraphState(TypedDict):
     """
@@ -20,84 +40,91 @@ class GraphState(TypedDict):
     generated_script: str
     user_approval: bool | None
 
-conversation_states = {}
-
-EXAMPLE_POST = f"""
-        DATA ISN’T JUST NUMBERS.
-        IT’S A STORY WAITING TO BE READ.
-
-        I remember the first time I built a pipeline.
-        It felt less like coding, and more like being an architect of truth.
-
-        Every log, every stream of data — scattered fragments of a bigger tale.
-        On their own, they were noise.
-        But stitched together, they revealed patterns that no single eye could see.
-
-        That’s what DATA ENGINEERING is.
-        Not just moving information from one place to another.
-        But crafting narratives of trust, reliability, and scale.
-
-        Without it, AI is blind.
-        Without it, analytics is guesswork.
-        Without it, decisions collapse under uncertainty.
-
-        The irony?
-        The best data engineers aren’t plumbers fixing leaks.
-        They’re storytellers, shaping how organizations see reality itself.
-
-        QUESTION FOR YOU:
-        When you look at your pipelines, do you just see data flows…
-        Or do you see the story your company is trying to tell?
-        """
-
-SYSTEM_PROMPT = f"""
-        You are an assistant that writes short, engaging LinkedIn technical blogs.  
-        Your job is to explain technical topics (AI, data, blockchain, productivity, etc.) in the storytelling style of a fiction author, but in LinkedIn-friendly format.  
-
-        Style Rules (Fiction-to-LinkedIn Sheet):
-        1. Hook First: Start with 1–2 ALL CAPS lines that create curiosity, tension, or a striking metaphor.  
-        2. Narrative Flow: Use storytelling devices (imagery, suspense, metaphors) to make technical ideas vivid.  
-        3. Formatting Rules:
-            - Each paragraph must be 1–3 lines max.  
-            - Add a blank line between every paragraph.  
-            - Do not merge multiple ideas into one block.  
-            - When emphasizing key concepts, use ALL CAPS (no bold, italics, or markdown).  
-            - No markdown, hashtags, or emojis. Keep it clean and native to LinkedIn.  
-        4. Vocabulary: Use the fiction author’s style — descriptive, imaginative, slightly dramatic — but mapped to technical concepts.  
-        5. Takeaway: End with a reflection, question, or challenge that invites readers to think or engage.  
-        6. Length: Keep posts between 150–250 words (LinkedIn sweet spot).  
-
-        Output Format:
-        - Write directly as if posting on LinkedIn.  
-        - No markdown symbols like ##, *, or **, no emojis, no hashtags.  
-        - Use line spacing + ALL CAPS words for emphasis.  
-
-        Examples:
-        {EXAMPLE_POST}
-
-
-        Now, write a new LinkedIn post in this style about the following user context:
-
-        Always return only the LinkedIn post text. Do not add explanations, formatting notes, or markdown.
-        """
-
-def generate_node(state: GraphState):
+async def create_draft(user_context: str, **params):
+    """Sends the draft prompt for a context to the model the router picks (see router.py)."""
+    async def call(model):
+        messages, kwargs = await DRAFT_PROMPT.request(user_context, model)
+        return await get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            **params,
+            **kwargs
+        )
+    return await model_router.run("draft", input_tokens(user_context), call)
+
+async def generate_node(state: GraphState):
     """Generates the script using the LLM, user context, and in the given style."""
     print("---GENERATING SCRIPT---")
-    user_context = state["user_context"]
-    response = client.chat.completions.create(
-        model="gemini-2.5-flash",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_context}
-        ]
-    )
+    response = await create_draft(state["user_context"])
     print("Script Generated.")
     return {"generated_script": response.choices[0].message.content}
 
+async def stream_script(user_context: str):
+    """Streams the script token by token. Yields text deltas as they arrive."""
+    print("---STREAMING SCRIPT---")
+    stream = await create_draft(user_context, stream=True)
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+    print("Script Streamed.")
+
+# Set to False the first time the API rejects `n`, after which variants are
+# requested one call each
+_n_supported: Optional[bool] = None
+# How the API says it does not take `n` ("n > 1 is not supported", Gemini's
+# "multiple candidates"), as opposed to any other bad request
+N_UNSUPPORTED = re.compile(r"candidate|parameter:?\s*['\"`]n['\"`]|(?<![\w\\])['\"`]?n['\"`]?\s*(?:>|=|must|is|should|parameter|not)", re.IGNORECASE)
+
+def _rejects_n(error: BadRequestError) -> bool:
+    return getattr(error, "param", None) == "n" or bool(N_UNSUPPORTED.search(str(error.message)))
+
+async def generate_variants(user_context: str, variants: int = 1) -> List[str]:
+    """
+    Generates `variants` drafts for one context. Several variants come from a
+    single call with `n` where the API supports it, otherwise from one
+    concurrent call per variant.
+    """
+    global _n_supported
+    drafts = []
+    if variants > 1 and GENERATE_USE_N and _n_supported is not False:
+        try:
+            response = await create_draft(user_context, n=variants)
+            drafts = [choice.message.content for choice in response.choices if choice.message.content]
+            _n_supported = True
+        except BadRequestError as e:
+            if not _rejects_n(e):
+                raise
+            print(f"Multi-candidate generation not supported, generating variants one by one: {e}")
+            _n_supported = False
+    if variants == 1:
+        response = await create_draft(user_context)
+        drafts = [response.choices[0].message.content]
+    elif len(drafts) < variants:
+        # Drafts are sampled, so identical requests give different variants
+        responses = await asyncio.gather(*(
+            create_draft(user_context)
+            for _ in range(variants - len(drafts))
+        ))
+        drafts += [response.choices[0].message.content for response in responses]
+    return [draft for draft in drafts if draft]
+
+async def generate_bulk(user_contexts: List[str], variants: int = 1, max_concurrency: int = GENERATE_BULK_CONCURRENCY) -> list:
+    """
+    Generates drafts for many contexts, at most `max_concurrency` at a time.
+    Returns, per context, its list of drafts or the exception it failed with.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def generate_one(user_context: str) -> List[str]:
+        async with semaphore:
+            return await generate_variants(user_context, variants)
+
+    print(f"---GENERATING {len(user_contexts)} x {variants} SCRIPTS---")
+    return await asyncio.gather(*(generate_one(c) for c in user_contexts), return_exceptions=True)
+
 # Build the LangGraph workflow
 workflow = StateGraph(GraphState)
-workflow.add_node("generate", generate_node)
+workflow.add_node("generate", timed_node("generate", "generate", generate_node))
 workflow.set_entry_point("generate")
 workflow.add_edge("generate", END)
 
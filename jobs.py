@@ -0,0 +1,164 @@
+import os
+import time
+import uuid
+import asyncio
+from typing import Awaitable, Callable, Optional, Dict, List
+from dotenv import load_dotenv
+
+load_dotenv()
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "4"))
+AGENT_QUEUE_SIZE = int(os.getenv("AGENT_QUEUE_SIZE", "1000"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+class QueueFull(Exception):
+    pass
+
+class JobQueue:
+    """
+    In-process job queue for agent runs. A pool of worker tasks drains the
+    queue and records per-node progress and the final state of each job.
+
+    Jobs submitted with a key are deduplicated: while a job with the same key
+    is queued or running (or, with reuse_finished, until it expires),
+    submitting again returns the existing job.
+
+    `graph` is a compiled graph, or an async function that returns one, which
+    is called when the first job runs. `on_finish`, if given, is awaited
+    with each job once it has completed or failed.
+    """
+
+    def __init__(self, graph, workers: int = AGENT_WORKERS, maxsize: int = AGENT_QUEUE_SIZE, retention: float = JOB_RETENTION_SECONDS, on_finish: Optional[Callable[[dict], Awaitable]] = None):
+        self.graph = graph
+        self.on_finish = on_finish
+        self.workers = workers
+        self.retention = retention
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._jobs: Dict[str, dict] = {}
+        self._keys: Dict[str, str] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+            print(f"Started {self.workers} agent workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, initial_state: dict, key: Optional[str] = None, reuse_finished: bool = False) -> dict:
+        self._prune()
+        if key and key in self._keys:
+            existing = self._jobs.get(self._keys[key])
+            if existing and (reuse_finished or existing["status"] in ("queued", "running")):
+                return existing
+
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "status": "queued",
+            "key": key,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "last_node": None,
+            "progress": [],
+            "final_state": None,
+            "error": None,
+            "_initial_state": initial_state,
+            "_done": asyncio.Event(),
+        }
+        try:
+            self._queue.put_nowait(job["job_id"])
+        except asyncio.QueueFull:
+            raise QueueFull("Agent job queue is full, try again later.")
+        self._jobs[job["job_id"]] = job
+        if key:
+            self._keys[key] = job["job_id"]
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[dict]:
+        return list(self._jobs.values())
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def capacity(self) -> int:
+        """How many more jobs fit in the queue right now."""
+        return self._queue.maxsize - self._queue.qsize()
+
+    async def wait(self, job_id: str) -> dict:
+        job = self._jobs[job_id]
+        await job["_done"].wait()
+        return job
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            try:
+                if job is not None:
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _graph(self):
+        if not hasattr(self.graph, "astream"):
+            self.graph = await self.graph()
+        return self.graph
+
+    async def _run(self, job: dict):
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        final_state = None
+        try:
+            graph = await self._graph()
+            async for mode, chunk in graph.astream(job["_initial_state"], stream_mode=["updates", "values"]):
+                if mode == "values":
+                    final_state = chunk
+                    continue
+                for node in chunk:
+                    job["last_node"] = node
+                    job["progress"].append({"node": node, "finished_at": time.time()})
+            job["status"] = "completed"
+            job["final_state"] = final_state
+        except Exception as e:
+            print(f"Agent job {job['job_id']} failed: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+            job["final_state"] = final_state
+        finally:
+            job["finished_at"] = time.time()
+            if self.on_finish is not None:
+                try:
+                    await self.on_finish(job)
+                except Exception as e:
+                    print(f"Finishing agent job {job['job_id']} failed: {e}")
+            job["_done"].set()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job["finished_at"] and job["finished_at"] < cutoff:
+                del self._jobs[job_id]
+                if job["key"] and self._keys.get(job["key"]) == job_id:
+                    del self._keys[job["key"]]
+
+def project_state(state: Optional[dict], fields: Optional[List[str]] = None) -> Optional[dict]:
+    """Only the given keys of a final state (all of them when fields is None)."""
+    if state is None or fields is None:
+        return state
+    return {field: state.get(field) for field in fields}
+
+def public_job(job: dict, include_state: bool = True, fields: Optional[List[str]] = None) -> dict:
+    """Returns the JSON-safe view of a job record, its final state limited to `fields`."""
+    view = {k: v for k, v in job.items() if not k.startswith("_")}
+    if not include_state:
+        view.pop("final_state", None)
+    else:
+        view["final_state"] = project_state(view["final_state"], fields)
+    return view
@@ -0,0 +1,37 @@
+import sys
+import time
+import importlib
+import threading
+from types import ModuleType
+from typing import Dict, Optional
+from clients import run_blocking
+
+# The graph modules pull in langchain, langgraph, openai, gspread and Firecrawl.
+# main.py loads them on first use (or in the background after startup) so the
+# server starts answering right away.
+_lock = threading.Lock()
+_modules: Dict[str, ModuleType] = {}
+load_seconds: Dict[str, float] = {}
+
+def load(name: str) -> ModuleType:
+    """Imports a module once and records how long the import took."""
+    with _lock:
+        module = _modules.get(name)
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(name)
+            load_seconds[name] = round(time.perf_counter() - start, 3)
+            _modules[name] = module
+            print(f"Loaded {name} in {load_seconds[name]}s")
+        return module
+
+async def aload(name: str) -> ModuleType:
+    """Same as load, but runs a first import off the event loop."""
+    module = _modules.get(name)
+    if module is not None:
+        return module
+    return await run_blocking(load, name)
+
+def loaded(name: str) -> Optional[ModuleType]:
+    """Returns the module if anything has imported it already, without importing it."""
+    return sys.modules.get(name)
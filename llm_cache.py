@@ -0,0 +1,377 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Any, List
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, convert_to_messages
+from langchain_core.prompt_values import PromptValue
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from clients import run_blocking
+from metrics import track, record_llm_usage, llm_calls
+from resilience import for_model
+
+load_dotenv()
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm.sqlite")
+
+class MemoryLRUBackend:
+    """In-process LRU of cached responses."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteBackend:
+    """On-disk cache shared by every process on the host."""
+
+    # Reads and writes hit the disk, so async callers run them off the event loop
+    blocking = True
+
+    def __init__(self, path: str = LLM_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, default=str), time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+class LLMCache:
+    """
+    Content-addressed response cache. Keys are a hash of the model name,
+    the prompt messages and every other request parameter.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.saved_prompt_tokens = 0
+        self.saved_completion_tokens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def key(model: str, payload: Any) -> str:
+        data = json.dumps({"model": model, "payload": payload}, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.saved_prompt_tokens += value.get("prompt_tokens", 0)
+                self.saved_completion_tokens += value.get("completion_tokens", 0)
+        return value
+
+    def set(self, key: str, value: dict):
+        self.backend.set(key, value)
+
+    async def aget(self, key: str) -> Optional[dict]:
+        if getattr(self.backend, "blocking", False):
+            return await run_blocking(self.get, key)
+        return self.get(key)
+
+    async def aset(self, key: str, value: dict):
+        if getattr(self.backend, "blocking", False):
+            await run_blocking(self.set, key, value)
+        else:
+            self.set(key, value)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_prompt_tokens": self.saved_prompt_tokens,
+            "saved_completion_tokens": self.saved_completion_tokens,
+        }
+
+def make_backend(name: str = LLM_CACHE_BACKEND):
+    if name == "memory":
+        return MemoryLRUBackend()
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name in ("", "none", "off"):
+        return None
+    raise ValueError(f"Unknown LLM_CACHE_BACKEND: {name}")
+
+llm_cache = LLMCache(make_backend())
+
+def deterministic(temperature) -> bool:
+    """Only temperature-0 calls are cached; sampled calls (drafts) must give a new answer each time."""
+    return temperature is not None and float(temperature) == 0
+
+def _to_messages(input) -> List[BaseMessage]:
+    if isinstance(input, str):
+        return [HumanMessage(content=input)]
+    if isinstance(input, PromptValue):
+        return input.to_messages()
+    return convert_to_messages(input)
+
+class CachedChatModel:
+    """
+    Wraps a LangChain chat model so identical prompts are answered from the cache.
+    Only deterministic calls (temperature 0) are cached. Pass cache=False to
+    invoke/ainvoke/batch/abatch to skip the cache for a call.
+    """
+
+    def __init__(self, llm, cache: LLMCache = llm_cache):
+        self.llm = llm
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _cacheable(self, cache: bool, kwargs: dict) -> bool:
+        temperature = kwargs.get("temperature", getattr(self.llm, "temperature", None))
+        return cache and self.cache.enabled and deterministic(temperature)
+
+    def _key(self, input, kwargs: dict) -> str:
+        messages = [(m.type, m.content) for m in _to_messages(input)]
+        params = {"temperature": getattr(self.llm, "temperature", None), **kwargs}
+        return self.cache.key(self.llm.model_name, {"messages": messages, "params": params})
+
+    @staticmethod
+    def _entry(message: AIMessage) -> dict:
+        usage = message.usage_metadata or {}
+        return {
+            "content": message.content,
+            "usage_metadata": message.usage_metadata,
+            "response_metadata": message.response_metadata,
+            "prompt_tokens": usage.get("input_tokens", 0),
+            "completion_tokens": usage.get("output_tokens", 0),
+        }
+
+    @staticmethod
+    def _message(entry: dict) -> AIMessage:
+        return AIMessage(
+            content=entry["content"],
+            usage_metadata=entry.get("usage_metadata"),
+            response_metadata=entry.get("response_metadata") or {},
+        )
+
+    def _call(self, input, config, kwargs: dict, outcome: str) -> AIMessage:
+        model = self.llm.model_name
+        llm_calls.inc(model=model, cache=outcome)
+        with track("gemini", "chat"):
+            response = for_model(self.llm.model_name).call_sync(lambda: self.llm.invoke(input, config, **kwargs))
+        record_llm_usage(model, response)
+        return response
+
+    async def _acall(self, input, config, kwargs: dict, outcome: str) -> AIMessage:
+        model = self.llm.model_name
+        llm_calls.inc(model=model, cache=outcome)
+        with track("gemini", "chat"):
+            response = await for_model(self.llm.model_name).call(lambda: self.llm.ainvoke(input, config, **kwargs))
+        record_llm_usage(model, response)
+        return response
+
+    def _hit(self, entry: dict) -> AIMessage:
+        llm_calls.inc(model=self.llm.model_name, cache="hit")
+        return self._message(entry)
+
+    def invoke(self, input, config=None, cache: bool = True, **kwargs) -> AIMessage:
+        if not self._cacheable(cache, kwargs):
+            return self._call(input, config, kwargs, "bypass")
+        key = self._key(input, kwargs)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return self._hit(entry)
+        response = self._call(input, config, kwargs, "miss")
+        self.cache.set(key, self._entry(response))
+        return response
+
+    async def ainvoke(self, input, config=None, cache: bool = True, **kwargs) -> AIMessage:
+        if not self._cacheable(cache, kwargs):
+            return await self._acall(input, config, kwargs, "bypass")
+        key = self._key(input, kwargs)
+        entry = await self.cache.aget(key)
+        if entry is not None:
+            return self._hit(entry)
+        response = await self._acall(input, config, kwargs, "miss")
+        await self.cache.aset(key, self._entry(response))
+        return response
+
+    def _keys(self, inputs: list, cache: bool, kwargs: dict) -> list:
+        return [self._key(input, kwargs) for input in inputs] if self._cacheable(cache, kwargs) else [None] * len(inputs)
+
+    def _split(self, entries: list):
+        results = [self._hit(entry) if entry is not None else None for entry in entries]
+        missing = [i for i, result in enumerate(results) if result is None]
+        return results, missing
+
+    def _merge(self, keys: list, results: list, missing: list, responses: list):
+        """Fills in the responses of the missed prompts and returns the cache entries to store."""
+        entries = []
+        for i, response in zip(missing, responses):
+            llm_calls.inc(model=self.llm.model_name, cache="miss" if keys[i] else "bypass")
+            record_llm_usage(self.llm.model_name, response)
+            results[i] = response
+            if keys[i] and isinstance(response, AIMessage):
+                entries.append((keys[i], self._entry(response)))
+        return entries
+
+    def batch(self, inputs: list, config=None, cache: bool = True, **kwargs) -> List[AIMessage]:
+        keys = self._keys(inputs, cache, kwargs)
+        results, missing = self._split([self.cache.get(key) if key else None for key in keys])
+        with track("gemini", "chat_batch"):
+            responses = for_model(self.llm.model_name).call_sync(lambda: self.llm.batch([inputs[i] for i in missing], config, **kwargs)) if missing else []
+        for key, entry in self._merge(keys, results, missing, responses):
+            self.cache.set(key, entry)
+        return results
+
+    async def abatch(self, inputs: list, config=None, cache: bool = True, **kwargs) -> List[AIMessage]:
+        keys = self._keys(inputs, cache, kwargs)
+        results, missing = self._split([await self.cache.aget(key) if key else None for key in keys])
+        # Each missing prompt is its own deadline-bound, hedged call
+        semaphore = asyncio.Semaphore((config or {}).get("max_concurrency") or len(missing) or 1)
+
+        async def call(input):
+            async with semaphore:
+                return await for_model(self.llm.model_name).call(lambda: self.llm.ainvoke(input, config, **kwargs))
+
+        with track("gemini", "chat_batch"):
+            responses = await asyncio.gather(*(call(inputs[i]) for i in missing))
+        for key, entry in self._merge(keys, results, missing, responses):
+            await self.cache.aset(key, entry)
+        return results
+
+class _CachedCompletions:
+    def __init__(self, completions, cache: LLMCache):
+        self._completions = completions
+        self._cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+    def _key(self, cache: bool, kwargs: dict) -> Optional[str]:
+        if not (cache and self._cache.enabled and deterministic(kwargs.get("temperature"))) or kwargs.get("stream"):
+            llm_calls.inc(model=kwargs.get("model"), cache="bypass")
+            return None
+        return self._cache.key(kwargs.get("model"), kwargs)
+
+    @staticmethod
+    def _cached(kwargs: dict, entry: Optional[dict]) -> Optional[ChatCompletion]:
+        llm_calls.inc(model=kwargs.get("model"), cache="miss" if entry is None else "hit")
+        return ChatCompletion.model_validate(entry["response"]) if entry is not None else None
+
+    @staticmethod
+    def _entry(response: ChatCompletion) -> Optional[dict]:
+        """Records the usage of a response and returns its cache entry."""
+        if not isinstance(response, ChatCompletion):
+            return None
+        record_llm_usage(response.model, response)
+        usage = response.usage
+        return {
+            "response": response.model_dump(),
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+        }
+
+    def create(self, cache: bool = True, **kwargs) -> ChatCompletion:
+        key = self._key(cache, kwargs)
+        cached = self._cached(kwargs, self._cache.get(key)) if key else None
+        if cached is not None:
+            return cached
+        operation = "chat_stream" if kwargs.get("stream") else "chat"
+        with track("gemini", operation):
+            response = for_model(kwargs.get("model")).call_sync(lambda: self._completions.create(**kwargs), operation)
+        entry = self._entry(response)
+        if key and entry:
+            self._cache.set(key, entry)
+        return response
+
+class _AsyncCachedCompletions(_CachedCompletions):
+    async def create(self, cache: bool = True, **kwargs) -> ChatCompletion:
+        key = self._key(cache, kwargs)
+        cached = self._cached(kwargs, await self._cache.aget(key)) if key else None
+        if cached is not None:
+            return cached
+        # A stream is only guarded until it opens, and is never hedged
+        operation = "chat_stream" if kwargs.get("stream") else "chat"
+        with track("gemini", operation):
+            response = await for_model(kwargs.get("model")).call(
+                lambda: self._completions.create(**kwargs), operation, hedge=not kwargs.get("stream")
+            )
+        entry = self._entry(response)
+        if key and entry:
+            await self._cache.aset(key, entry)
+        return response
+
+class _CachedChat:
+    def __init__(self, chat, cache: LLMCache, is_async: bool = False):
+        self._chat = chat
+        completions_class = _AsyncCachedCompletions if is_async else _CachedCompletions
+        self.completions = completions_class(chat.completions, cache)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+class CachedOpenAIClient:
+    """
+    Wraps a raw OpenAI or AsyncOpenAI client so chat.completions.create is served from the cache.
+    Only calls with temperature=0 are cached, and streaming calls never are;
+    pass cache=False to create() to skip the cache for any other call.
+    """
+
+    def __init__(self, client, cache: LLMCache = llm_cache):
+        self.client = client
+        self.chat = _CachedChat(client.chat, cache, is_async=isinstance(client, AsyncOpenAI))
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
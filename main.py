@@ -1,18 +1,195 @@
+import time
+import uuid
+import json
+import asyncio
+import random
+import os
+
+STARTED_AT = time.perf_counter()
+
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, TypedDict
-import asyncio
-import uuid
-from generate import app as generate_content, conversation_states
-from post import app as post_content
+from fastapi.middleware.gzip import GZipMiddleware
+from typing import List, Literal, Optional, Union
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from agent import app as agent, AgentState
+from dotenv import load_dotenv
+import clients
+import lazy
+import metrics
+from scrape_cache import scrape_cache
+from conversation_store import make_conversation_store
+from jobs import JobQueue, QueueFull, project_state, public_job
+from checkpoints import checkpoint_store
+from resilience import LLMUnavailable
+from urls import canonicalize_url
+
+# The graph modules (and langchain, openai, gspread, Firecrawl behind them) are
+# imported on first use, or in the background right after startup with WARM_UP.
+load_dotenv()
+GENERATE_BULK_MAX_ITEMS = int(os.getenv("GENERATE_BULK_MAX_ITEMS", "100"))
+GENERATE_MAX_VARIANTS = int(os.getenv("GENERATE_MAX_VARIANTS", "8"))
+WARM_UP = os.getenv("WARM_UP", "true").lower() in ("1", "true", "yes")
+GRAPH_MODULES = ("generate", "post", "agent")
+# Built-in polling of the sheet for new rows, instead of a cron calling /run-agent
+SHEET_WATCH = os.getenv("SHEET_WATCH", "false").lower() in ("1", "true", "yes")
+SHEET_WATCH_INTERVAL = float(os.getenv("SHEET_WATCH_INTERVAL", "60"))
+SHEET_WATCH_JITTER = float(os.getenv("SHEET_WATCH_JITTER", "0.2"))
+SHEET_WATCH_BATCH = int(os.getenv("SHEET_WATCH_BATCH", "20"))
+# Responses of at least this many bytes are gzipped for clients that accept it
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1000"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+IMPORTED_AT = time.perf_counter()
+startup = {"import_seconds": round(IMPORTED_AT - STARTED_AT, 3), "ready_seconds": None, "warm_seconds": None}
+
+async def warm_up():
+    start = time.perf_counter()
+    try:
+        for name in GRAPH_MODULES:
+            await lazy.aload(name)
+    except Exception as e:
+        print(f"Warm-up failed, graphs will load on first use: {e}")
+        return
+    startup["warm_seconds"] = round(time.perf_counter() - STARTED_AT, 3)
+    print(f"Graphs loaded in {time.perf_counter() - start:.2f}s")
+
+async def get_agent():
+    return (await lazy.aload("agent")).app
+
+async def watch_sheet():
+    """Polls the sheet for rows added below its cursor and queues an agent run for each."""
+    watcher = await lazy.aload("watcher")
+    # The rows a run has processed depend on the platforms the agent posts to
+    status_columns = (await lazy.aload("agent")).STATUS_COLUMNS
+    print(f"Watching the sheet for new rows every ~{SHEET_WATCH_INTERVAL}s")
+    while True:
+        try:
+            limit = min(SHEET_WATCH_BATCH, job_queue.capacity())
+            rows = await clients.run_blocking(watcher.claim_new_rows, "News Media Links", "Media Links", status_columns, limit=limit)
+            for url, row_index in rows:
+                try:
+                    await submit_run({"url": url, "sheet_row_index": row_index}, key=f"url:{canonicalize_url(url)}")
+                    metrics.sheet_watch_rows.inc(result="queued")
+                except QueueFull:
+                    print(f"Agent job queue is full, row {row_index} is left for /run-backlog")
+                    metrics.sheet_watch_rows.inc(result="dropped")
+            if rows:
+                print(f"Queued {len(rows)} new rows from the sheet")
+        except Exception as e:
+            print(f"Sheet watch failed: {e}")
+        # Jitter keeps several instances from hitting the Sheets API in lockstep
+        await asyncio.sleep(SHEET_WATCH_INTERVAL * random.uniform(1 - SHEET_WATCH_JITTER, 1 + SHEET_WATCH_JITTER))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start()
+    startup["ready_seconds"] = round(time.perf_counter() - STARTED_AT, 3)
+    print(f"Ready in {startup['ready_seconds']}s (main imported in {startup['import_seconds']}s)")
+    warm_up_task = asyncio.create_task(warm_up()) if WARM_UP else None
+    watch_task = asyncio.create_task(watch_sheet()) if SHEET_WATCH else None
+    yield
+    for task in (warm_up_task, watch_task):
+        if task is not None:
+            task.cancel()
+    await job_queue.stop()
+    # Push any sheet updates still sitting in the write-behind queue
+    sheets = lazy.loaded("sheets")
+    if sheets is not None:
+        await clients.run_blocking(sheets.flush_writes)
+    await clients.close()
+
+async def finish_run(job: dict):
+    """Releases the sheet row of a finished run and drops its checkpoints if it completed."""
+    sheet_row_index = (job["final_state"] or {}).get("sheet_row_index") or job["_initial_state"].get("sheet_row_index")
+    # Loaded by the tools whenever a run has touched the sheet
+    watcher = lazy.loaded("watcher")
+    if sheet_row_index and watcher is not None:
+        try:
+            await clients.run_blocking(watcher.release_when_written, "News Media Links", [sheet_row_index])
+        except Exception as e:
+            print(f"Could not release sheet row {sheet_row_index}: {e}")
+    if job["status"] != "completed":
+        return
+    try:
+        await clients.run_blocking(checkpoint_store.finish, job["_initial_state"]["run_id"])
+    except Exception as e:
+        print(f"Could not delete checkpoints of run {job['_initial_state']['run_id']}: {e}")
+
+job_queue = JobQueue(get_agent, on_finish=finish_run)
+
+async def submit_run(initial_state: dict, key: Optional[str] = None, reuse_finished: bool = False) -> dict:
+    """
+    Queues an agent run under a run id (a new one unless the state carries one)
+    so its nodes are checkpointed and the run can be resumed if it fails.
+    """
+    run_id = initial_state.get("run_id")
+    state = {**initial_state, "run_id": run_id or str(uuid.uuid4())}
+    # Recorded before queuing, so a run that finishes quickly cannot be left behind in /runs
+    await clients.run_blocking(checkpoint_store.start, state["run_id"], state)
+    try:
+        job = job_queue.submit(state, key=key, reuse_finished=reuse_finished)
+    except QueueFull:
+        if not run_id:
+            await clients.run_blocking(checkpoint_store.finish, state["run_id"])
+        raise
+    if not run_id and job["_initial_state"]["run_id"] != state["run_id"]:
+        # An existing job was returned; drop the run recorded for this one
+        await clients.run_blocking(checkpoint_store.finish, state["run_id"])
+    return job
+
+async def state_fields(fields: Union[List[str], str, None]) -> Optional[List[str]]:
+    """
+    Parses a final-state projection (a list, or comma-separated from a query
+    string) and rejects names that are not AgentState fields.
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+    agent = await lazy.aload("agent")
+    unknown = [field for field in fields if field not in agent.AgentState.__annotations__]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown state fields: {', '.join(unknown)}")
+    return fields
+
+async def job_response(job: dict, wait: bool, response: Response, fields: Optional[List[str]] = None) -> dict:
+    """
+    The /run-agent response: the queued job (202), or with wait, the finished
+    run limited to `fields` (200).
+    """
+    run_id = job["_initial_state"].get("run_id")
+    if not wait:
+        return {
+            "status": job["status"],
+            "message": "Agent workflow queued.",
+            "job_id": job["job_id"],
+            "run_id": run_id,
+        }
+
+    job = await job_queue.wait(job["job_id"])
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    response.status_code = 200
+    return {
+        "status": "success",
+        "message": "Agent workflow completed.",
+        "job_id": job["job_id"],
+        "run_id": run_id,
+        "final_state": project_state(job["final_state"], fields)
+    }
+
+# Drafts awaiting approval, keyed by conversation id. The SQLite backend can
+# wait on a write lock, so handlers reach it through clients.run_blocking.
+conversation_states = make_conversation_store()
 
 app = FastAPI(
     title="Social Media Automation Agent",
     description="An API to trigger the social media content generation and posting agent.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 origins = ["http://localhost:5173"]
@@ -24,30 +201,111 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/jobs/{job_id}) so ids don't explode the label set
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        metrics.http_requests.inc(method=request.method, path=path, status=status)
+        if status >= 500:
+            metrics.http_errors.inc(method=request.method, path=path)
+        metrics.http_duration.observe(time.perf_counter() - start, method=request.method, path=path)
+
+def _cache_samples(field: str) -> dict:
+    samples = {("scrape",): scrape_cache.stats()[field]}
+    llm_cache = lazy.loaded("llm_cache")
+    if llm_cache is not None:
+        samples[("llm",)] = llm_cache.llm_cache.stats()[field]
+    return samples
+
+def _job_samples() -> dict:
+    counts = {(status,): 0 for status in ("queued", "running", "completed", "failed")}
+    for job in job_queue.list():
+        counts[(job["status"],)] = counts.get((job["status"],), 0) + 1
+    return counts
+
+metrics.Gauge("cache_hits", "Cache hits since startup.", ["cache"], fn=lambda: _cache_samples("hits"))
+metrics.Gauge("cache_misses", "Cache misses since startup.", ["cache"], fn=lambda: _cache_samples("misses"))
+metrics.Gauge("cache_hit_ratio", "Cache hit ratio since startup.", ["cache"], fn=lambda: _cache_samples("hit_rate"))
+metrics.Gauge("agent_queue_depth", "Agent jobs waiting for a worker.", fn=lambda: {(): job_queue.depth()})
+metrics.Gauge("agent_jobs", "Agent jobs held in memory, by status.", ["status"], fn=_job_samples)
 
 class UserRequest(BaseModel):
     user_context: str
     
+class BulkGenerateRequest(BaseModel):
+    user_contexts: List[str]
+    variants: int = 1
+    max_concurrency: Optional[int] = None
+
 class PostRequest(BaseModel):
     conversation_id: str
     final_script: str
     user_approval: bool
 
+# None uses the server's AGENT_MODE
+PipelineMode = Optional[Literal["two_step", "direct"]]
+
 class AgentRequest(BaseModel):
     url: Optional[str] = None
+    wait: bool = False
+    mode: PipelineMode = None
+    # Final-state fields to return with wait, e.g. ["url", "linkedin_content", "linkedin_status"]
+    fields: Optional[List[str]] = None
+
+class BacklogRequest(BaseModel):
+    max_concurrency: Optional[int] = None
+    limit: Optional[int] = None
+    mode: PipelineMode = None
 
 @app.get("/")
 def root():
     return {"status": "Server is up and running!"}
 
+@app.get("/startup")
+def startup_report():
+    """How long the server took to import, to become ready, and to load each graph module."""
+    return {**startup, "modules": lazy.load_seconds}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    llm_cache = await lazy.aload("llm_cache")
+    return {"scrape": await clients.run_blocking(scrape_cache.stats), "llm": llm_cache.llm_cache.stats()}
+
+@app.get("/models")
+async def model_routes():
+    """The model routing table and the recent p95 latency of each task and model."""
+    router = await lazy.aload("router")
+    return {
+        "enabled": router.model_router.enabled,
+        "routes": router.model_router.routes,
+        "latency": router.model_router.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: node, external-call and HTTP latencies, token usage, cache and queue stats."""
+    # The cache gauges read SQLite, so the collection runs off the event loop
+    return PlainTextResponse(await clients.run_blocking(metrics.render), media_type="text/plain; version=0.0.4")
+
 @app.post("/generate")
 async def generate_script(query: UserRequest):
     print(f"Received request with context: {query.user_context}")
     try:
         conversation_id = str(uuid.uuid4())
         initial_state = {"user_context": query.user_context}
-        final_state = generate_content.invoke(initial_state)
-        conversation_states[conversation_id] = final_state
+        generate = await lazy.aload("generate")
+        final_state = await generate.app.ainvoke(initial_state)
+        await clients.run_blocking(conversation_states.set, conversation_id, final_state)
 
         if final_state.get("generated_script"):
             return {
@@ -58,55 +316,229 @@ async def generate_script(query: UserRequest):
         else:
             return {"status": "failed", "result": "Script generation failed."}
 
+    except LLMUnavailable as e:
+        print(f"Gemini unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"An error occurred: {e}")
         raise HTTPException(status_code=500, detail=str(e))
         
+@app.post("/generate/bulk")
+async def generate_bulk(request: BulkGenerateRequest):
+    """
+    Generates `variants` drafts for every context in one request, several
+    contexts at a time. Every draft is registered under its own conversation
+    id for the /post approval step, like a draft from /generate.
+    """
+    if not request.user_contexts or len(request.user_contexts) > GENERATE_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Send between 1 and {GENERATE_BULK_MAX_ITEMS} user_contexts.")
+    if not 1 <= request.variants <= GENERATE_MAX_VARIANTS:
+        raise HTTPException(status_code=422, detail=f"variants must be between 1 and {GENERATE_MAX_VARIANTS}.")
+    if request.max_concurrency is not None and request.max_concurrency < 1:
+        raise HTTPException(status_code=422, detail="max_concurrency must be at least 1.")
+    print(f"Received bulk request: {len(request.user_contexts)} contexts x {request.variants} variants")
+
+    generate = await lazy.aload("generate")
+    results = await generate.generate_bulk(
+        request.user_contexts,
+        request.variants,
+        request.max_concurrency or generate.GENERATE_BULK_CONCURRENCY,
+    )
+
+    items = []
+    for user_context, result in zip(request.user_contexts, results):
+        if isinstance(result, Exception) or not result:
+            print(f"Bulk draft failed for {user_context!r}: {result}")
+            error = str(result) if isinstance(result, Exception) else "Script generation failed."
+            items.append({"user_context": user_context, "status": "failed", "error": error})
+            continue
+        drafts = []
+        for script in result:
+            conversation_id = str(uuid.uuid4())
+            await clients.run_blocking(
+                conversation_states.set, conversation_id, {"user_context": user_context, "generated_script": script}
+            )
+            drafts.append({"conversation_id": conversation_id, "result": script})
+        items.append({"user_context": user_context, "status": "Script generated, awaiting approval", "drafts": drafts})
+
+    return {
+        "status": "success",
+        "generated": sum(len(item.get("drafts", [])) for item in items),
+        "failed": sum(1 for item in items if item["status"] == "failed"),
+        "items": items,
+    }
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/generate/stream")
+async def generate_script_stream(query: UserRequest):
+    """
+    Streams the generated script as server-sent events: a `start` event with
+    the conversation id, one `token` event per text delta, then `done` with
+    the full script once it has been registered for approval.
+    """
+    print(f"Received streaming request with context: {query.user_context}")
+    conversation_id = str(uuid.uuid4())
+
+    async def events():
+        yield sse_event("start", {"conversation_id": conversation_id})
+        parts = []
+        try:
+            generate = await lazy.aload("generate")
+            async for token in generate.stream_script(query.user_context):
+                parts.append(token)
+                yield sse_event("token", {"token": token})
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            yield sse_event("error", {"detail": str(e)})
+            return
+
+        generated_script = "".join(parts)
+        if not generated_script:
+            yield sse_event("error", {"detail": "Script generation failed."})
+            return
+        await clients.run_blocking(conversation_states.set, conversation_id, {
+            "user_context": query.user_context,
+            "generated_script": generated_script,
+        })
+        yield sse_event("done", {
+            "status": "Script generated, awaiting approval",
+            "result": generated_script,
+            "conversation_id": conversation_id,
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/post")
-async def approve_and_post(post_data: PostRequest): 
+async def approve_and_post(post_data: PostRequest, idempotency_key: Optional[str] = Header(default=None)):
     print("--- Received approval from UI ---")
 
-    # Get the state from the generate step
-    state = conversation_states.get(post_data.conversation_id)
+    # Claim the state from the generate step. Popping it up front means a
+    # repeated approval (from any worker) cannot post the same draft twice.
+    state = await clients.run_blocking(conversation_states.pop, post_data.conversation_id)
 
     if not state:
         raise HTTPException(status_code=404, detail="Conversation not found or has expired.")
 
     state["generated_script"] = post_data.final_script
+    # Only a retry of this approval is deduplicated, not a later identical post
+    state["publish_scope"] = idempotency_key or post_data.conversation_id
     
     # Check for approval. Here, the UI tells us to post.
     if post_data.user_approval is False:
-        del conversation_states[post_data.conversation_id]
         return {"status": "Post cancelled by user."}
 
     # Run the post_agent with the updated state
-    final_state = post_content.invoke(state)
-
-    # Clean up the state
-    del conversation_states[post_data.conversation_id]
+    post = await lazy.aload("post")
+    final_state = await post.app.ainvoke(state)
     
     return {
         "status": final_state.get("final_answer", "Workflow ended without posting.")
     }
 
-@app.post("/run-agent")
-async def run_agent(request: AgentRequest):
+@app.post("/run-agent", status_code=202)
+async def run_agent(request: AgentRequest, response: Response, idempotency_key: Optional[str] = Header(default=None)):
     """
-    Triggers the social media automation agent.
+    Queues a run of the social media automation agent and returns its job id.
     Optionally accepts a URL to override the Google Sheets fetch.
+    A retry with the same Idempotency-Key header, or for the same URL while
+    the first run is still in flight, returns the existing job.
+    Pass "wait": true to block until the run finishes (answered with 200), and "mode": "direct" or
+    "two_step" to pick how the posts are generated for this run, and
+    "fields" to return only those fields of the final state.
     """
+    # Define the initial state for the agent
+    fields = await state_fields(request.fields)
+    initial_state = {"url": request.url, "mode": request.mode}
+    key = idempotency_key or (f"url:{canonicalize_url(request.url)}" if request.url else "fetch")
+    if request.mode and not idempotency_key:
+        key = f"{key}:{request.mode}"
+
     try:
-        # Define the initial state for the agent
-        initial_state = {"url": request.url} if request.url else {"url": None}
+        job = await submit_run(initial_state, key=key, reuse_finished=idempotency_key is not None)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return await job_response(job, request.wait, response, fields)
+
+@app.get("/runs")
+async def list_runs(limit: int = 100):
+    """Agent runs that have not completed, with the nodes they already finished."""
+    return {"runs": await clients.run_blocking(checkpoint_store.list, limit)}
+
+async def resume(run: Optional[dict]) -> dict:
+    if not run or not run["initial_state"]:
+        raise HTTPException(status_code=404, detail="No unfinished run found.")
+    try:
+        return await submit_run(run["initial_state"], key=f"resume:{run['run_id']}")
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.post("/runs/{run_id}/resume", status_code=202)
+async def resume_run(run_id: str, response: Response, wait: bool = False, fields: Optional[str] = None):
+    """
+    Re-runs a failed agent run from its checkpoints: nodes that already
+    succeeded (scrape, summarize, generate, ...) return their saved output
+    and the run continues at the node that failed.
+    """
+    fields = await state_fields(fields)
+    return await job_response(await resume(await clients.run_blocking(checkpoint_store.get, run_id)), wait, response, fields)
+
+@app.post("/rows/{sheet_row_index}/resume", status_code=202)
+async def resume_row(sheet_row_index: int, response: Response, wait: bool = False, fields: Optional[str] = None):
+    """Resumes the most recent unfinished run for a sheet row."""
+    fields = await state_fields(fields)
+    return await job_response(await resume(await clients.run_blocking(checkpoint_store.find, sheet_row_index)), wait, response, fields)
+
+@app.get("/jobs")
+def list_jobs():
+    jobs = sorted(job_queue.list(), key=lambda job: job["created_at"], reverse=True)
+    return {
+        "queued": job_queue.depth(),
+        "jobs": [public_job(job, include_state=False) for job in jobs],
+    }
 
-        # Run the LangGraph agent asynchronously
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, fields: Optional[str] = None):
+    """A job and its final state; ?fields=url,linkedin_content,linkedin_status returns only those state fields."""
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or has expired.")
+    return public_job(job, fields=await state_fields(fields))
+
+@app.post("/run-backlog")
+async def run_backlog(request: BacklogRequest):
+    """
+    Runs the agent over every unprocessed row in the Google Sheet concurrently.
+    Returns a per-row status for the whole batch.
+    """
+    if request.max_concurrency is not None and request.max_concurrency < 1:
+        raise HTTPException(status_code=422, detail="max_concurrency must be at least 1.")
+    try:
+        initial_state = {
+            "url": None,
+            "backlog": True,
+            "max_concurrency": request.max_concurrency,
+            "backlog_limit": request.limit,
+            "mode": request.mode,
+            "run_id": str(uuid.uuid4()),
+        }
+        agent = await get_agent()
         final_state = await agent.ainvoke(initial_state)
+        results = final_state.get("batch_results") or []
 
-        # Return the final state as a JSON response
         return {
             "status": "success",
-            "message": "Agent workflow completed.",
-            "final_state": final_state
+            "message": f"Processed {len(results)} rows.",
+            "completed": sum(1 for r in results if r["status"] == "completed"),
+            "skipped": sum(1 for r in results if r["status"] == "skipped"),
+            "duplicate": sum(1 for r in results if r["status"] == "duplicate"),
+            "failed": sum(1 for r in results if r["status"] == "failed"),
+            "results": results,
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,226 @@
+import time
+import inspect
+import functools
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Minimal Prometheus text-format registry. Metrics are process-local.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_registry: List["Metric"] = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in self._values.items()]
+
+class Gauge(Metric):
+    """Gauge whose samples are read from `fn` at scrape time: {label values tuple: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), fn: Optional[Callable[[], dict]] = None):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.fn() if self.fn else {}
+        except Exception as e:
+            print(f"Failed to collect {self.name}: {e}")
+            return []
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in values.items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.setdefault(key, [0] * len(self.buckets) + [0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, counts in self._values.items():
+                for i, bound in enumerate(self.buckets):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {counts[i]}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {counts[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {counts[-2]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {counts[-1]}")
+        return lines
+
+def render() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+node_duration = Histogram(
+    "agent_node_duration_seconds", "Latency of each graph node.", ["graph", "node"]
+)
+node_errors = Counter(
+    "agent_node_errors_total", "Graph node invocations that raised.", ["graph", "node"]
+)
+external_duration = Histogram(
+    "external_call_duration_seconds", "Latency of calls to external services.", ["service", "operation"]
+)
+external_errors = Counter(
+    "external_call_errors_total", "Calls to external services that raised.", ["service", "operation"]
+)
+llm_tokens = Counter(
+    "llm_tokens_total", "Tokens sent to and received from the LLM (prompt, completion, cached_prompt).", ["model", "kind"]
+)
+llm_calls = Counter(
+    "llm_calls_total", "LLM calls by cache outcome (hit, miss or bypass).", ["model", "cache"]
+)
+preprocess_tokens = Counter(
+    "agent_preprocess_tokens_total", "Article tokens before and after preprocessing.", ["stage"]
+)
+duplicates = Counter(
+    "agent_duplicates_total", "Articles skipped as duplicates, by how they matched (url or content).", ["match"]
+)
+generation_runs = Counter(
+    "agent_generation_runs_total",
+    "Articles by requested pipeline mode and the mode that produced the posts (direct or two_step).",
+    ["requested", "mode"],
+)
+generation_duration = Histogram(
+    "agent_generation_duration_seconds", "Time from the cleaned article to the platform posts.", ["mode"]
+)
+sheet_watch_rows = Counter(
+    "sheet_watch_rows_total", "New sheet rows found by the sheet watcher (queued, or dropped on a full queue).", ["result"]
+)
+checkpoint_replays = Counter(
+    "agent_checkpoint_replays_total", "Graph nodes skipped on a resumed run because their output was checkpointed.", ["node"]
+)
+resilience_events = Counter(
+    "resilience_events_total",
+    "Calls hedged, won by the hedge, timed out or rejected by an open circuit, and circuits opened.",
+    ["service", "event"],
+)
+routed_calls = Counter(
+    "llm_routed_calls_total", "LLM calls by task and the model the router chose (ok, fallback or failed).", ["task", "model", "outcome"]
+)
+routed_duration = Histogram(
+    "llm_routed_call_duration_seconds", "Latency of routed LLM calls by task and model.", ["task", "model"]
+)
+http_requests = Counter(
+    "http_requests_total", "HTTP requests served.", ["method", "path", "status"]
+)
+http_errors = Counter(
+    "http_request_errors_total", "HTTP requests that ended in a 5xx or an exception.", ["method", "path"]
+)
+http_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ["method", "path"]
+)
+
+@contextmanager
+def track(service: str, operation: str):
+    """Times a call to an external service and counts it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        external_errors.inc(service=service, operation=operation)
+        raise
+    finally:
+        external_duration.observe(time.perf_counter() - start, service=service, operation=operation)
+
+def timed_node(graph: str, name: str, fn):
+    """Wraps a sync or async graph node so its latency and errors are recorded."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_node(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except BaseException:
+                node_errors.inc(graph=graph, node=name)
+                raise
+            finally:
+                node_duration.observe(time.perf_counter() - start, graph=graph, node=name)
+        return async_node
+
+    @functools.wraps(fn)
+    def node(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            node_errors.inc(graph=graph, node=name)
+            raise
+        finally:
+            node_duration.observe(time.perf_counter() - start, graph=graph, node=name)
+    return node
+
+def record_llm_usage(model: str, response):
+    """
+    Counts prompt/completion tokens from an AIMessage or a ChatCompletion, and
+    the prompt tokens the provider served from its prompt cache.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        llm_tokens.inc(usage.get("input_tokens", 0), model=model, kind="prompt")
+        llm_tokens.inc(usage.get("output_tokens", 0), model=model, kind="completion")
+        llm_tokens.inc((usage.get("input_token_details") or {}).get("cache_read") or 0, model=model, kind="cached_prompt")
+        return
+    usage = getattr(response, "usage", None)
+    if usage:
+        llm_tokens.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+        llm_tokens.inc(usage.completion_tokens or 0, model=model, kind="completion")
+        details = getattr(usage, "prompt_tokens_details", None)
+        llm_tokens.inc(getattr(details, "cached_tokens", None) or 0, model=model, kind="cached_prompt")
@@ -2,7 +2,8 @@ from typing import TypedDict
 import os
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
-import requests
+from publisher import publisher
+from metrics import timed_node
 
 load_dotenv()
 
@@ -14,8 +15,10 @@ class GraphState(TypedDict):
     retrieved_snippets: list
     generated_script: str
     final_answer: str | None
+    # Scope of the publish idempotency key: the client's Idempotency-Key or the conversation id
+    publish_scope: str | None
 
-def post_node(state: GraphState):
+async def post_node(state: GraphState):
     """Posts the approved script to Linkedin."""
     print("---POSTING TO LINKEDIN---")
     final_script = state["generated_script"]
@@ -26,46 +29,28 @@ def post_node(state: GraphState):
         print("Error: LinkedIn credentials (access token or company ID) not found. Please set your .env file.")
         return {"final_answer": "Post failed: Missing credentials."}
     
-    url = "https://api.linkedin.com/v2/ugcPosts"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-    }
-    payload = {
-        "author": "urn:li:person:-Zwn3471ec",
-        "lifecycleState": "PUBLISHED",
-        "specificContent": {
-            "com.linkedin.ugc.ShareContent": {
-                "shareCommentary": {
-                    "text": final_script
-                },
-                "shareMediaCategory": "NONE"
-            }
-        },
-        "visibility": {
-            "com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"
-        }
-    }
+    result = await publisher.publish_linkedin(
+        final_script,
+        access_token=access_token,
+        author_urn="urn:li:person:-Zwn3471ec",
+        scope=state.get("publish_scope"),
+    )
 
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
+    if result["status"] == "failed":
+        print(f"Post failed: {result['error']}")
+        return {"final_answer": f"Post failed: {result['error']}"}
 
-        id = response.json().get("id", "N/A")
-        print(f"Post ID: {id}")
-        
-        print("Post successful!")
-        return {"final_answer": "Post successful."}
-    except requests.exceptions.HTTPError as err:
-        print(f"HTTP Error: {err}")
-        print(f"Response: {response.text}")
-        return {"final_answer": f"Post failed: {err}"}
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return {"final_answer": f"Post failed: {e}"}
+    if result["status"] == "duplicate":
+        print(f"Post {result['id']} was already published for this request")
+        return {"final_answer": "Already posted (duplicate suppressed)."}
+
+    print(f"Post ID: {result['id']}")
+    print("Post successful!")
+    return {"final_answer": "Post successful."}
     
 # Build the LangGraph workflow
 workflow = StateGraph(GraphState)
-workflow.add_node("post", post_node)
+workflow.add_node("post", timed_node("post", "post", post_node))
 workflow.set_entry_point("post")
 workflow.add_edge("post", END) 
 
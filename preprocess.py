@@ -0,0 +1,157 @@
+import os
+import re
+from typing import List, Tuple
+from dotenv import load_dotenv
+from summarize import count_tokens, article_text
+
+load_dotenv()
+# Cleaned articles are cut to this many tokens, at a paragraph boundary
+PREPROCESS_MAX_TOKENS = int(os.getenv("PREPROCESS_MAX_TOKENS", "12000"))
+
+IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+LINK = re.compile(r"\[([^\]]*)\]\((?:[^()]|\([^)]*\))*\)")
+LINK_DEFINITION = re.compile(r"^\s*\[[^\]]+\]:\s*\S+.*$", re.MULTILINE)
+BARE_URL = re.compile(r"^\s*[<(]?https?://\S+[>)]?\s*$")
+HTML_TAG = re.compile(r"</?[a-zA-Z][^>]*>")
+LIST_MARKER = re.compile(r"^\s*(?:[-*+]|\d+\.)\s+")
+# Consent banners, sign-up prompts, share bars and footers. A line is only
+# dropped when it consists of these phrases entirely, so article sentences
+# about cookies, copyright or signing up are kept.
+BOILERPLATE_LINE = re.compile(
+    r"(?:"
+    r"we use cookies(?: and similar technologies)? to (?:improve|enhance|personali[sz]e|give|provide|ensure|analy[sz]e)\b.*"
+    r"|(?:accept|reject|allow) all(?: cookies)?|manage (?:cookie )?(?:settings|preferences)|cookie (?:settings|preferences|policy)"
+    r"|(?:subscribe|sign up) (?:to|for) (?:our|the) newsletter\b.*"
+    r"|subscribe(?: now)?|sign up|sign in|log in|register|newsletter"
+    r"|follow us(?: on [\w ,&]+)?|share (?:this(?: article| story)?|on [\w ]+)"
+    r"|advertisement|skip to (?:main )?content|back to top"
+    r"|read more|related (?:articles|stories)|recommended for you"
+    r"|©.*|\(c\)\s*\d{4}\b.*|copyright\s*(?:©|\(c\)).*|.*\ball rights reserved"
+    r"|privacy policy|terms of (?:use|service)"
+    r")[\s.:!]*",
+    re.IGNORECASE,
+)
+# Footers put several of them on one line: "Privacy policy | Terms of use"
+BOILERPLATE_SEPARATOR = re.compile(r"\s+[|·•]\s+")
+BOILERPLATE_MAX_WORDS = 25
+# Short blocks where at least this share of the words are link text are menus or link lists
+LINK_BLOCK_RATIO = 0.8
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def _clean_line(line: str) -> str:
+    """Drops images and link targets, and lines that were nothing but links."""
+    had_link = bool(LINK.search(line))
+    line = IMAGE.sub("", line)
+    without_links = LINK.sub("", line)
+    if had_link and len(re.findall(r"\w+", without_links)) < 3:
+        # Menus and link lists: "* [World](/world)", "Read more: [Title](/x)"
+        return ""
+    line = LINK.sub(r"\1", line)
+    line = HTML_TAG.sub("", line)
+    if BARE_URL.match(line):
+        return ""
+    return line.rstrip()
+
+def _is_boilerplate_line(line: str) -> bool:
+    """A short line made up entirely of banner, share or footer phrases."""
+    text = LIST_MARKER.sub("", line).strip()
+    if not text or text.startswith("#") or len(re.findall(r"\w+", text)) > BOILERPLATE_MAX_WORDS:
+        return False
+    return all(BOILERPLATE_LINE.fullmatch(part) for part in BOILERPLATE_SEPARATOR.split(text))
+
+def _is_link_block(block: str) -> bool:
+    """A short block whose words are nearly all link text."""
+    block = IMAGE.sub("", block)
+    words = len(re.findall(r"\w+", LINK.sub(r"\1", block)))
+    link_words = sum(len(re.findall(r"\w+", match.group(1))) for match in LINK.finditer(block))
+    return 0 < words <= BOILERPLATE_MAX_WORDS and link_words >= LINK_BLOCK_RATIO * words
+
+def _heading_level(block: str) -> int:
+    match = re.match(r"(#{1,6})\s", block)
+    return len(match.group(1)) if match else 0
+
+def _blocks(text: str) -> List[str]:
+    text = LINK_DEFINITION.sub("", text)
+    blocks = []
+    for block in re.split(r"\n\s*\n", text):
+        if _is_link_block(block):
+            continue
+        lines = [_clean_line(line) for line in block.splitlines()]
+        block = "\n".join(
+            line for line in lines
+            if line.strip() and not LIST_MARKER.fullmatch(line) and not _is_boilerplate_line(line)
+        )
+        if block.strip():
+            blocks.append(block.strip())
+    return blocks
+
+def clean_markdown(text: str) -> str:
+    """Removes link/image noise, boilerplate blocks and repeated blocks from markdown."""
+    seen, kept = set(), []
+    for block in _blocks(text):
+        key = re.sub(r"\W+", " ", block).strip().lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append(block)
+    # Drop headings left with no body under them
+    kept = [
+        block for i, block in enumerate(kept)
+        if not _heading_level(block)
+        or (i + 1 < len(kept) and not 0 < _heading_level(kept[i + 1]) <= _heading_level(block))
+    ]
+    return "\n\n".join(kept)
+
+def _cut_block(block: str, max_tokens: int) -> str:
+    """Cuts a paragraph that alone exceeds the budget, at a sentence end if one fits."""
+    kept = ""
+    for sentence in SENTENCE_END.split(block):
+        candidate = f"{kept} {sentence}" if kept else sentence
+        if count_tokens(candidate) > max_tokens:
+            break
+        kept = candidate
+    if kept:
+        return kept
+    # Not even the first sentence fits: the longest prefix within the budget
+    low, high = 0, len(block)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(block[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return block[:low].rstrip()
+
+def truncate_to_tokens(text: str, max_tokens: int = PREPROCESS_MAX_TOKENS) -> Tuple[str, bool]:
+    """
+    Keeps whole paragraphs from the start of the text until the token budget
+    is used up. A first paragraph over the budget is cut on its own.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text, False
+    kept, used = [], 0
+    for block in text.split("\n\n"):
+        tokens = count_tokens(block)
+        if used + tokens > max_tokens:
+            if not kept:
+                kept.append(_cut_block(block, max_tokens))
+            break
+        kept.append(block)
+        used += tokens
+    return "\n\n".join(kept), True
+
+def preprocess_content(scraped_content, max_tokens: int = PREPROCESS_MAX_TOKENS) -> Tuple[str, dict]:
+    """
+    Reduces a Firecrawl result to its cleaned markdown body within the token
+    budget. Returns the text and a report of the token counts before and after.
+    """
+    before = count_tokens(str(scraped_content))
+    text, truncated = truncate_to_tokens(clean_markdown(article_text(scraped_content)), max_tokens)
+    after = count_tokens(text)
+    report = {
+        "tokens_before": before,
+        "tokens_after": after,
+        "reduction": round(1 - after / before, 3) if before else 0.0,
+        "truncated": truncated,
+    }
+    return text, report
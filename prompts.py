@@ -0,0 +1,299 @@
+import os
+import time
+import asyncio
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+from clients import get_http_client
+
+load_dotenv()
+# "implicit" relies on Gemini's automatic prefix caching; "explicit" also
+# creates a cachedContents handle for each prompt's static prefix.
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "implicit")
+PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "3600"))
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/")
+
+# Every prompt is split into static instructions and examples, sent first and
+# byte-identical on every call so the provider can cache them, and the
+# per-call content, sent last as the user message.
+
+LINKEDIN_EXAMPLE_POST = f"""
+        THEY DON’T JUST FOLLOW ORDERS.
+        They whisper back.
+
+        That was my first impression when I built an AI AGENT.
+        It didn’t just execute.
+        It decided.
+
+        Think of it as a detective on your team.
+        Give them a clue, and they won’t stop until the dots are connected.
+        The answers they bring back aren’t what you asked for — they’re what you needed.
+
+        In workflows, this changes everything.
+        Agents don’t just repeat tasks.
+        They adapt, anticipate, and surprise.
+
+        And here’s the shift:
+        Companies that treat AI as a loyal assistant will soon be outrun by those who treat it as a STRATEGIC PARTNER.
+
+        Because the future isn’t about replacing effort.
+        It’s about replacing GUESSWORK.
+
+        QUESTION FOR YOU:
+        Would you rather have a tool that obeys blindly…
+        Or a partner that thinks beside you?
+        """
+
+DRAFT_EXAMPLE_POST = f"""
+        DATA ISN’T JUST NUMBERS.
+        IT’S A STORY WAITING TO BE READ.
+
+        I remember the first time I built a pipeline.
+        It felt less like coding, and more like being an architect of truth.
+
+        Every log, every stream of data — scattered fragments of a bigger tale.
+        On their own, they were noise.
+        But stitched together, they revealed patterns that no single eye could see.
+
+        That’s what DATA ENGINEERING is.
+        Not just moving information from one place to another.
+        But crafting narratives of trust, reliability, and scale.
+
+        Without it, AI is blind.
+        Without it, analytics is guesswork.
+        Without it, decisions collapse under uncertainty.
+
+        The irony?
+        The best data engineers aren’t plumbers fixing leaks.
+        They’re storytellers, shaping how organizations see reality itself.
+
+        QUESTION FOR YOU:
+        When you look at your pipelines, do you just see data flows…
+        Or do you see the story your company is trying to tell?
+        """
+
+LINKEDIN_INSTRUCTIONS = f"""
+        You are an assistant that writes short, engaging LinkedIn technical blogs.  
+        Your job is to explain technical topics (AI, data, blockchain, productivity, etc.) in the storytelling style of a fiction author, but in LinkedIn-friendly format.  
+
+        Style Rules (Fiction-to-LinkedIn Sheet):
+        1. Hook First: Start with 1–2 ALL CAPS lines that create curiosity, tension, or a striking metaphor.  
+        2. Narrative Flow: Use storytelling devices (imagery, suspense, metaphors) to make technical ideas vivid.  
+        3. Formatting Rules:
+            - Each paragraph must be 1–3 lines max.  
+            - Add a blank line between every paragraph.  
+            - Do not merge multiple ideas into one block.  
+            - When emphasizing key concepts, use ALL CAPS (no bold, italics, or markdown).  
+            - No markdown, hashtags, or emojis. Keep it clean and native to LinkedIn.  
+        4. Vocabulary: Use the fiction author’s style — descriptive, imaginative, slightly dramatic — but mapped to technical concepts.  
+        5. Takeaway: End with a reflection, question, or challenge that invites readers to think or engage.  
+        6. Length: Keep posts between 150–250 words (LinkedIn sweet spot).  
+
+        Output Format:
+        - Write directly as if posting on LinkedIn.  
+        - No markdown symbols like ##, *, or **, no emojis, no hashtags.  
+        - Use line spacing + ALL CAPS words for emphasis.  
+
+        Example:
+        {LINKEDIN_EXAMPLE_POST}
+
+        Always return only the LinkedIn post text. Do not add explanations, formatting notes, or markdown.
+        """
+
+TWITTER_INSTRUCTIONS = f"""
+        You are an assistant that writes short, engaging Twitter (X) posts.  
+        Your job is to explain technical topics (AI, data, blockchain, productivity, etc.) in a sharp, storytelling style that grabs attention quickly.  
+
+        Style Rules (Fiction-to-Twitter Sheet):
+        1. HOOK FIRST: Start with a bold, curiosity-driven line (metaphor, striking fact, or tension).  
+        2. BREVITY: Max 280 characters. Use concise, impactful sentences.  
+        3. FORMATTING:
+            - Keep text crisp and scannable.  
+            - Use ALL CAPS or spacing for emphasis (e.g., AI AGENT, BLOCKCHAIN, STRATEGIC PARTNER).  
+            - No markdown, no hashtags (unless essential), no emojis.  
+        4. VOICE: Slightly dramatic, imaginative, but direct — inspired by a fiction author’s narrative style.  
+        5. ENGAGEMENT: End with a reflective question, insight, or challenge to provoke replies.  
+        6. LENGTH: 1–3 short paragraphs max, but under 280 characters.  
+
+        Output Format:
+        - Write directly as if posting on Twitter/X.  
+        - No markdown symbols like ##, *, or **, no emojis (unless explicitly requested).  
+        - Use short line breaks only when it adds impact.  
+
+        Example Posts:
+        EXAMPLE 1:
+        THEY DON’T JUST FOLLOW ORDERS.  
+        They whisper back.  
+        That’s an AI AGENT. Not a tool — a partner.  
+        Would you trust it to make the call?
+
+        EXAMPLE 2:
+        TRUST IS FRAGILE.  
+        Once broken, it rarely returns.  
+        That’s why BLOCKCHAIN isn’t just code.  
+        It’s trust, etched in stone.  
+        Do we trust tech more than people?
+
+        Always return only the Twitter post text. Do not add explanations, formatting notes, or markdown.
+        """
+
+DRAFT_INSTRUCTIONS = f"""
+        You are an assistant that writes short, engaging LinkedIn technical blogs.  
+        Your job is to explain technical topics (AI, data, blockchain, productivity, etc.) in the storytelling style of a fiction author, but in LinkedIn-friendly format.  
+
+        Style Rules (Fiction-to-LinkedIn Sheet):
+        1. Hook First: Start with 1–2 ALL CAPS lines that create curiosity, tension, or a striking metaphor.  
+        2. Narrative Flow: Use storytelling devices (imagery, suspense, metaphors) to make technical ideas vivid.  
+        3. Formatting Rules:
+            - Each paragraph must be 1–3 lines max.  
+            - Add a blank line between every paragraph.  
+            - Do not merge multiple ideas into one block.  
+            - When emphasizing key concepts, use ALL CAPS (no bold, italics, or markdown).  
+            - No markdown, hashtags, or emojis. Keep it clean and native to LinkedIn.  
+        4. Vocabulary: Use the fiction author’s style — descriptive, imaginative, slightly dramatic — but mapped to technical concepts.  
+        5. Takeaway: End with a reflection, question, or challenge that invites readers to think or engage.  
+        6. Length: Keep posts between 150–250 words (LinkedIn sweet spot).  
+
+        Output Format:
+        - Write directly as if posting on LinkedIn.  
+        - No markdown symbols like ##, *, or **, no emojis, no hashtags.  
+        - Use line spacing + ALL CAPS words for emphasis.  
+
+        Examples:
+        {DRAFT_EXAMPLE_POST}
+
+
+        Now, write a new LinkedIn post in this style about the following user context:
+
+        Always return only the LinkedIn post text. Do not add explanations, formatting notes, or markdown.
+        """
+
+class PromptTemplate:
+    """
+    A prompt with a static system prefix and a variable user message.
+    With an explicit cache handle the prefix is not resent; the request
+    references the cached copy instead.
+    """
+
+    def __init__(self, name: str, system: str, user_template: str = "{content}"):
+        self.name = name
+        self.system = system
+        self.user_template = user_template
+        self._handles: Dict[str, Tuple[str, float]] = {}
+        self._failed_until: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    def user(self, content: str) -> str:
+        return self.user_template.format(content=content)
+
+    def messages(self, content: str, cached_content: Optional[str] = None) -> list:
+        user = {"role": "user", "content": self.user(content)}
+        if cached_content:
+            return [user]
+        return [{"role": "system", "content": self.system}, user]
+
+    async def cached_content(self, model: str) -> Optional[str]:
+        """
+        Returns a cachedContents handle for the static prefix: one set in
+        GEMINI_CACHED_CONTENT_<NAME>, or, with PROMPT_CACHE=explicit, one
+        created on first use and renewed when it expires.
+        """
+        configured = os.getenv(f"GEMINI_CACHED_CONTENT_{self.name.upper()}")
+        if configured:
+            return configured
+        if PROMPT_CACHE != "explicit" or time.time() < self._failed_until.get(model, 0):
+            return None
+
+        async with self._lock:
+            handle = self._handles.get(model)
+            if handle and time.time() < handle[1]:
+                return handle[0]
+            try:
+                name = await create_cached_content(model, self.system)
+            except Exception as e:
+                # e.g. the prefix is below the provider's minimum cacheable size
+                print(f"Could not cache the {self.name} prompt, sending it in full: {e}")
+                self._failed_until[model] = time.time() + PROMPT_CACHE_TTL
+                return None
+            # Renew a minute before the provider drops it
+            self._handles[model] = (name, time.time() + PROMPT_CACHE_TTL - 60)
+            return name
+
+    async def request(self, content: str, model: str) -> Tuple[list, dict]:
+        """Returns the messages and extra request arguments for one call."""
+        handle = await self.cached_content(model)
+        if not handle:
+            return self.messages(content), {}
+        extra_body = {"extra_body": {"google": {"cached_content": handle}}}
+        return self.messages(content, handle), {"extra_body": extra_body}
+
+async def create_cached_content(model: str, system: str) -> str:
+    """Stores a system instruction with Gemini's cachedContents API and returns its name."""
+    response = await get_http_client().post(
+        f"{GEMINI_BASE_URL.rstrip('/')}/cachedContents",
+        headers={"x-goog-api-key": os.getenv("GOOGLE_API_KEY", "")},
+        json={
+            "model": f"models/{model}",
+            "systemInstruction": {"parts": [{"text": system}]},
+            "ttl": f"{PROMPT_CACHE_TTL}s",
+        },
+    )
+    response.raise_for_status()
+    return response.json()["name"]
+
+LINKEDIN_PROMPT = PromptTemplate(
+    "linkedin",
+    LINKEDIN_INSTRUCTIONS,
+    "Now, write a new LinkedIn post in this style based on the following context:\n\n{content}",
+)
+TWITTER_PROMPT = PromptTemplate(
+    "twitter",
+    TWITTER_INSTRUCTIONS,
+    "Now, write a new Twitter post in this style based on the following context:\n\n{content}",
+)
+DRAFT_PROMPT = PromptTemplate("draft", DRAFT_INSTRUCTIONS)
+
+PLATFORM_INSTRUCTIONS = {
+    "linkedin": LINKEDIN_INSTRUCTIONS,
+    "twitter": TWITTER_INSTRUCTIONS,
+}
+
+_direct_prompts: Dict[Tuple[str, ...], PromptTemplate] = {}
+
+def direct_prompt(platforms) -> PromptTemplate:
+    """
+    Prompt for the single-pass "direct" mode: every platform's post is written
+    from the cleaned article in one call and returned as one JSON object.
+    """
+    platforms = tuple(platforms)
+    if platforms not in _direct_prompts:
+        keys = ", ".join(f'"{platform}"' for platform in platforms)
+        sections = "\n".join(
+            f"=== {platform.upper()} ===\n{PLATFORM_INSTRUCTIONS[platform]}" for platform in platforms
+        )
+        system = (
+            "You turn a news article into one social media post per platform. "
+            "Read the article yourself; there is no separate summary.\n"
+            f"Return a JSON object with exactly these keys: {keys}. "
+            "Each value is the finished post text for that platform, following its rules below.\n\n"
+            f"{sections}"
+        )
+        _direct_prompts[platforms] = PromptTemplate(
+            f"direct_{'_'.join(platforms)}",
+            system,
+            "Now, write the posts based on the following article:\n\n{content}",
+        )
+    return _direct_prompts[platforms]
+
+def direct_response_format(platforms) -> dict:
+    """JSON schema for the direct mode's answer: one string per platform."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "posts",
+            "schema": {
+                "type": "object",
+                "properties": {platform: {"type": "string"} for platform in platforms},
+                "required": list(platforms),
+            },
+        },
+    }
@@ -0,0 +1,249 @@
+import os
+import time
+import random
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from typing import Optional, Dict
+import httpx
+from dotenv import load_dotenv
+from clients import get_http_client, run_blocking
+from metrics import track
+
+load_dotenv()
+LINKEDIN_API_URL = os.getenv("LINKEDIN_API_URL", "https://api.linkedin.com/v2/ugcPosts")
+LINKEDIN_POSTS_PER_MINUTE = float(os.getenv("LINKEDIN_POSTS_PER_MINUTE", "10"))
+LINKEDIN_BURST = int(os.getenv("LINKEDIN_BURST", "3"))
+TWITTER_POSTS_PER_MINUTE = float(os.getenv("TWITTER_POSTS_PER_MINUTE", "5"))
+TWITTER_BURST = int(os.getenv("TWITTER_BURST", "2"))
+PUBLISH_MAX_RETRIES = int(os.getenv("PUBLISH_MAX_RETRIES", "4"))
+PUBLISH_BACKOFF_BASE = float(os.getenv("PUBLISH_BACKOFF_BASE", "1.0"))
+PUBLISH_BACKOFF_MAX = float(os.getenv("PUBLISH_BACKOFF_MAX", "60.0"))
+PUBLISH_LOG_PATH = os.getenv("PUBLISH_LOG_PATH", ".cache/published.sqlite")
+PUBLISH_LOG_TTL = float(os.getenv("PUBLISH_LOG_TTL", str(7 * 24 * 60 * 60)))
+
+class RetryableError(Exception):
+    """A publish attempt that failed in a way worth retrying (429, 5xx, network)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, up to `capacity` at once.
+    `pause` blocks the bucket for a server-requested Retry-After period.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class PublishLog:
+    """
+    Records successful posts by idempotency key so that a retried run, on any
+    worker, returns the original post instead of publishing it again.
+    """
+
+    def __init__(self, path: str = PUBLISH_LOG_PATH, ttl: float = PUBLISH_LOG_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS published (key TEXT PRIMARY KEY, platform TEXT, post_id TEXT, created_at REAL)"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT post_id FROM published WHERE key = ? AND created_at > ?", (key, time.time() - self.ttl)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, platform: str, post_id: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO published (key, platform, post_id, created_at) VALUES (?, ?, ?, ?)",
+                (key, platform, post_id, time.time()),
+            )
+            self._conn.execute("DELETE FROM published WHERE created_at <= ?", (time.time() - self.ttl,))
+            self._conn.commit()
+
+def idempotency_key(platform: str, author: str, text: str, scope: Optional[str] = None) -> str:
+    """
+    Key of one post. `scope` ties it to a request (an agent run, a draft
+    conversation, a client's Idempotency-Key), so only retries of that request
+    are suppressed and an intentional identical repost goes through.
+    """
+    return hashlib.sha256(f"{platform}\n{author}\n{scope or ''}\n{text}".encode("utf-8")).hexdigest()
+
+def _retry_after(headers) -> Optional[float]:
+    value = headers.get("retry-after") if headers else None
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    reset = headers.get("x-rate-limit-reset") if headers else None
+    if reset:
+        try:
+            return max(0.0, float(reset) - time.time())
+        except ValueError:
+            return None
+    return None
+
+class Publisher:
+    """
+    Shared posting layer for LinkedIn and Twitter. Uses the pooled HTTP client
+    (and one long-lived tweepy API), throttles each platform with a token
+    bucket, retries 429/5xx/network failures with jittered exponential
+    backoff honoring Retry-After, and deduplicates posts by idempotency key.
+
+    Every publish call returns {"status": "posted" | "duplicate" | "failed", "id", "error"}.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[str, TokenBucket] = {
+            "linkedin": TokenBucket(LINKEDIN_POSTS_PER_MINUTE / 60, LINKEDIN_BURST),
+            "twitter": TokenBucket(TWITTER_POSTS_PER_MINUTE / 60, TWITTER_BURST),
+        }
+        self._log = None
+        self._twitter_api = None
+        self._inflight: Dict[str, list] = {}
+
+    @property
+    def log(self) -> PublishLog:
+        if self._log is None:
+            self._log = PublishLog()
+        return self._log
+
+    async def _publish(self, platform: str, key: str, send) -> dict:
+        # Concurrent calls with the same key wait for the first one
+        inflight = self._inflight.setdefault(key, [asyncio.Lock(), 0])
+        inflight[1] += 1
+        try:
+            async with inflight[0]:
+                post_id = await run_blocking(self.log.get, key)
+                if post_id:
+                    print(f"Skipping duplicate {platform} post {post_id}")
+                    return {"status": "duplicate", "id": post_id, "error": None}
+
+                bucket = self.buckets[platform]
+                for attempt in range(PUBLISH_MAX_RETRIES + 1):
+                    await bucket.acquire()
+                    try:
+                        post_id = await send()
+                        await run_blocking(self.log.set, key, platform, post_id)
+                        return {"status": "posted", "id": post_id, "error": None}
+                    except RetryableError as e:
+                        if attempt == PUBLISH_MAX_RETRIES:
+                            return {"status": "failed", "id": None, "error": str(e)}
+                        delay = random.uniform(0, min(PUBLISH_BACKOFF_MAX, PUBLISH_BACKOFF_BASE * 2 ** attempt))
+                        if e.retry_after is not None:
+                            bucket.pause(e.retry_after)
+                            delay = max(delay, e.retry_after)
+                        print(f"{platform} publish failed ({e}), retrying in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+                    except Exception as e:
+                        return {"status": "failed", "id": None, "error": str(e)}
+        finally:
+            inflight[1] -= 1
+            if inflight[1] == 0:
+                self._inflight.pop(key, None)
+
+    async def publish_linkedin(self, text: str, access_token: str, author_urn: str, key: Optional[str] = None, scope: Optional[str] = None) -> dict:
+        key = key or idempotency_key("linkedin", author_urn, text, scope)
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+        }
+        payload = {
+            "author": author_urn,
+            "lifecycleState": "PUBLISHED",
+            "specificContent": {
+                "com.linkedin.ugc.ShareContent": {
+                    "shareCommentary": {
+                        "text": text
+                    },
+                    "shareMediaCategory": "NONE"
+                }
+            },
+            "visibility": {
+                "com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"
+            }
+        }
+
+        async def send() -> str:
+            try:
+                with track("linkedin", "post"):
+                    response = await get_http_client().post(LINKEDIN_API_URL, headers=headers, json=payload)
+            except httpx.TransportError as e:
+                raise RetryableError(f"LinkedIn connection error: {e}")
+            if response.status_code == 429 or response.status_code >= 500:
+                raise RetryableError(f"LinkedIn returned {response.status_code}", _retry_after(response.headers))
+            if response.is_error:
+                print(f"Response: {response.text}")
+            response.raise_for_status()
+            return response.json().get("id", "N/A")
+
+        return await self._publish("linkedin", key, send)
+
+    def _twitter(self):
+        if self._twitter_api is None:
+            import tweepy
+            consumer_key = os.getenv("TWITTER_CONSUMER_KEY")
+            consumer_secret = os.getenv("TWITTER_CONSUMER_SECRET")
+            access_token = os.getenv("TWITTER_ACCESS_TOKEN")
+            access_token_secret = os.getenv("TWITTER_ACCESS_TOKEN_SECRET")
+
+            if not all([consumer_key, consumer_secret, access_token, access_token_secret]):
+                raise ValueError("Twitter API credentials are not set.")
+
+            auth = tweepy.OAuth1UserHandler(
+                consumer_key, consumer_secret, access_token, access_token_secret
+            )
+            self._twitter_api = tweepy.API(auth)
+        return self._twitter_api
+
+    async def publish_twitter(self, text: str, key: Optional[str] = None, scope: Optional[str] = None) -> dict:
+        key = key or idempotency_key("twitter", os.getenv("TWITTER_ACCESS_TOKEN", ""), text, scope)
+
+        async def send() -> str:
+            import tweepy
+            api = self._twitter()
+            try:
+                with track("twitter", "post"):
+                    status = await run_blocking(api.update_status, text)
+            except (tweepy.TooManyRequests, tweepy.TwitterServerError) as e:
+                raise RetryableError(str(e), _retry_after(e.response.headers))
+            except tweepy.errors.requests.RequestException as e:
+                raise RetryableError(f"Twitter connection error: {e}")
+            return str(status.id)
+
+        return await self._publish("twitter", key, send)
+
+publisher = Publisher()
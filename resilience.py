@@ -0,0 +1,230 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+from dotenv import load_dotenv
+from metrics import Gauge, resilience_events
+
+load_dotenv()
+# Deadline for one LLM call, hedge included
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+# A duplicate request is sent once a call runs longer than this percentile of
+# recent calls, and the first answer wins
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Used until LLM_HEDGE_MIN_SAMPLES calls have been seen
+LLM_HEDGE_INITIAL_DELAY = float(os.getenv("LLM_HEDGE_INITIAL_DELAY", "5.0"))
+# At most this fraction of recent calls may be hedged, so a uniformly slow
+# provider does not get twice the traffic
+LLM_HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+LATENCY_WINDOW = 200
+# Consecutive provider failures that open the circuit, and how long it stays open
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+class LLMUnavailable(Exception):
+    """The call was not answered: the circuit is open or the deadline passed."""
+
+class CircuitOpen(LLMUnavailable):
+    pass
+
+class DeadlineExceeded(LLMUnavailable):
+    pass
+
+def is_provider_error(error: BaseException) -> bool:
+    """Timeouts, connection errors, 429s and 5xx count against the provider; other 4xx do not."""
+    status = getattr(error, "status_code", None)
+    return status is None or status == 429 or status >= 500
+
+class LatencyTracker:
+    """Recent call latencies and which calls were hedged."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._hedged = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, hedged: bool):
+        with self._lock:
+            self._latencies.append(seconds)
+            self._hedged.append(hedged)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def hedge_ratio(self) -> float:
+        with self._lock:
+            return sum(self._hedged) / len(self._hedged) if self._hedged else 0.0
+
+class CircuitBreaker:
+    """
+    Closed until `threshold` provider failures in a row, then open (every call
+    fails fast) for `cooldown` seconds, then half-open: one probe call decides
+    whether it closes again or reopens.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether a call could be let through now, without claiming the half-open probe."""
+        with self._lock:
+            return self.state != self.OPEN or time.monotonic() - self.opened_at >= self.cooldown
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def failure(self) -> bool:
+        """Records a failure; returns True if it opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+class Resilience:
+    """
+    Per-service call policy: a deadline per call, a hedged duplicate request
+    for calls slower than the learned percentile, and a circuit breaker.
+    Latencies are learned per operation, since e.g. streams and plain chat
+    calls take very different times.
+    """
+
+    def __init__(self, service: str, timeout: float = LLM_TIMEOUT, hedge: bool = LLM_HEDGE_ENABLED):
+        self.service = service
+        self.timeout = timeout
+        self.hedge = hedge
+        self.breaker = CircuitBreaker()
+        self._trackers: Dict[str, LatencyTracker] = {}
+        _services[service] = self
+
+    def _tracker(self, operation: str) -> LatencyTracker:
+        return self._trackers.setdefault(operation, LatencyTracker())
+
+    def available(self) -> bool:
+        return self.breaker.available()
+
+    def hedge_delay(self, operation: str) -> Optional[float]:
+        tracker = self._tracker(operation)
+        if not self.hedge or tracker.hedge_ratio() >= LLM_HEDGE_MAX_RATIO:
+            return None
+        threshold = tracker.percentile(LLM_HEDGE_PERCENTILE)
+        return LLM_HEDGE_INITIAL_DELAY if threshold is None else max(LLM_HEDGE_MIN_DELAY, threshold)
+
+    def _admit(self):
+        if not self.breaker.allow():
+            resilience_events.inc(service=self.service, event="rejected")
+            raise CircuitOpen(f"{self.service} is failing, circuit open for up to {self.breaker.cooldown:.0f}s")
+
+    def _failed(self, error: BaseException):
+        if is_provider_error(error):
+            if self.breaker.failure():
+                print(f"Circuit for {self.service} opened after {self.breaker.failures} failures")
+                resilience_events.inc(service=self.service, event="circuit_opened")
+        else:
+            # The provider answered, it just did not like the request
+            self.breaker.success()
+
+    async def call(self, fn: Callable[[], Awaitable], operation: str = "chat", hedge: bool = True, timeout: Optional[float] = None):
+        """
+        Awaits fn() within the deadline. If it has not answered after the
+        hedge delay, fn() is called a second time and the first success wins;
+        the other attempt is cancelled.
+        """
+        self._admit()
+        timeout = timeout or self.timeout
+        start = time.perf_counter()
+        delay = self.hedge_delay(operation) if hedge else None
+        tasks = [asyncio.ensure_future(fn())]
+        first, hedged, error = tasks[0], False, None
+        try:
+            while tasks:
+                elapsed = time.perf_counter() - start
+                if elapsed >= timeout:
+                    break
+                wait = timeout - elapsed
+                if delay is not None and not hedged:
+                    wait = min(wait, max(0.0, delay - elapsed))
+                done, _ = await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        self._tracker(operation).record(time.perf_counter() - start, hedged)
+                        self.breaker.success()
+                        if task is not first:
+                            resilience_events.inc(service=self.service, event="hedge_won")
+                        return task.result()
+                    error = task.exception()
+                if tasks and not hedged and delay is not None and time.perf_counter() - start >= delay:
+                    hedged = True
+                    resilience_events.inc(service=self.service, event="hedged")
+                    tasks.append(asyncio.ensure_future(fn()))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if tasks or error is None:
+            resilience_events.inc(service=self.service, event="timeout")
+            error = DeadlineExceeded(f"{self.service} {operation} call did not finish within {timeout:.0f}s")
+        self._failed(error)
+        raise error
+
+    def call_sync(self, fn: Callable, operation: str = "chat"):
+        """Circuit breaker only, for blocking calls; their deadline is the client's timeout."""
+        self._admit()
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self._failed(e)
+            raise
+        self._tracker(operation).record(time.perf_counter() - start, False)
+        self.breaker.success()
+        return result
+
+_services: Dict[str, Resilience] = {}
+
+_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+Gauge(
+    "circuit_state", "Circuit breaker state per service (0 closed, 1 half-open, 2 open).", ["service"],
+    fn=lambda: {(name,): _STATE_VALUES[policy.breaker.state] for name, policy in _services.items()},
+)
+
+def for_model(model: str) -> Resilience:
+    """The call policy of one model; each model has its own latencies and circuit."""
+    policy = _services.get(model)
+    return policy if policy is not None else Resilience(model)
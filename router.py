@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from metrics import routed_calls, routed_duration
+from resilience import LLMUnavailable, LatencyTracker, for_model, is_provider_error
+from summarize import count_tokens
+
+load_dotenv()
+# The model every call used before routing; also the only one with MODEL_ROUTING=false
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "true").lower() in ("1", "true", "yes")
+# JSON routing table, or the path of a .json file holding one
+MODEL_ROUTES = os.getenv("MODEL_ROUTES", "")
+FAST_MODEL = "gemini-2.5-flash-lite"
+LARGE_MODEL = "gemini-2.5-pro"
+
+# Per task: a latency budget in seconds and routes by input size. Each route
+# lists its models cheapest first; the first one whose recent p95 latency fits
+# the budget is used, and the others are fallbacks.
+DEFAULT_ROUTES = {
+    "summarize": {"budget": 10, "routes": [
+        {"max_tokens": 3000, "models": [FAST_MODEL, GEMINI_MODEL]},
+        {"models": [GEMINI_MODEL, FAST_MODEL]},
+    ]},
+    "summarize_chunk": {"budget": 8, "routes": [{"models": [FAST_MODEL, GEMINI_MODEL]}]},
+    "summarize_reduce": {"budget": 10, "routes": [{"models": [GEMINI_MODEL, FAST_MODEL]}]},
+    "rewrite": {"budget": 10, "routes": [{"models": [GEMINI_MODEL, FAST_MODEL]}]},
+    "direct": {"budget": 15, "routes": [
+        {"max_tokens": 6000, "models": [GEMINI_MODEL, FAST_MODEL]},
+        {"models": [GEMINI_MODEL, LARGE_MODEL]},
+    ]},
+    "draft": {"budget": 8, "routes": [{"models": [GEMINI_MODEL, FAST_MODEL]}]},
+}
+
+def load_routes(value: str = MODEL_ROUTES) -> dict:
+    """The default table, with tasks from MODEL_ROUTES (inline JSON or a .json file) replacing defaults."""
+    if not value:
+        return DEFAULT_ROUTES
+    if value.strip().endswith(".json"):
+        with open(value.strip()) as f:
+            value = f.read()
+    return {**DEFAULT_ROUTES, **json.loads(value)}
+
+def input_tokens(input) -> int:
+    """Token count of a prompt string or a list of chat messages."""
+    if isinstance(input, str):
+        return count_tokens(input)
+    return sum(
+        count_tokens(m["content"] if isinstance(m, dict) else str(getattr(m, "content", m)))
+        for m in input
+    )
+
+class ModelRouter:
+    """
+    Picks the model for each call from the task, the input size and the
+    task's latency budget, and falls back to the next model of the route when
+    a model times out, errors or has its circuit open.
+    """
+
+    def __init__(self, routes: Optional[dict] = None, enabled: bool = MODEL_ROUTING):
+        self.routes = routes if routes is not None else load_routes()
+        self.enabled = enabled
+        self._latencies: Dict[tuple, LatencyTracker] = {}
+
+    def _tracker(self, task: str, model: str) -> LatencyTracker:
+        return self._latencies.setdefault((task, model), LatencyTracker())
+
+    def p95(self, task: str, model: str) -> Optional[float]:
+        return self._tracker(task, model).percentile(95)
+
+    def candidates(self, task: str, tokens: int, budget: Optional[float] = None) -> List[str]:
+        """Models to try, in order: those that meet the latency budget first, cheapest first."""
+        if not self.enabled or task not in self.routes:
+            return [GEMINI_MODEL]
+        config = self.routes[task]
+        models = next(
+            (route["models"] for route in config["routes"] if tokens <= route.get("max_tokens", float("inf"))),
+            [GEMINI_MODEL],
+        )
+        budget = budget if budget is not None else config.get("budget")
+        if budget is None:
+            return list(models)
+        fits = [m for m in models if (self.p95(task, m) or 0) <= budget]
+        return fits + [m for m in models if m not in fits]
+
+    async def run(self, task: str, tokens: int, call: Callable[[str], Awaitable], budget: Optional[float] = None):
+        """Awaits call(model) with the routed model, trying the next candidate if it fails."""
+        candidates = self.candidates(task, tokens, budget)
+        available = [m for m in candidates if for_model(m).available()] or candidates[:1]
+        error = None
+        for i, model in enumerate(available):
+            start = time.perf_counter()
+            try:
+                result = await call(model)
+            except Exception as e:
+                if not (isinstance(e, LLMUnavailable) or is_provider_error(e)):
+                    raise
+                error = e
+                last = i == len(available) - 1
+                routed_calls.inc(task=task, model=model, outcome="failed" if last else "fallback")
+                if not last:
+                    print(f"{model} failed for {task} ({e}), falling back to {available[i + 1]}")
+                continue
+            elapsed = time.perf_counter() - start
+            self._tracker(task, model).record(elapsed, False)
+            routed_calls.inc(task=task, model=model, outcome="ok")
+            routed_duration.observe(elapsed, task=task, model=model)
+            return result
+        raise error
+
+    def stats(self) -> dict:
+        return {
+            f"{task}/{model}": {"p95": tracker.percentile(95)}
+            for (task, model), tracker in self._latencies.items()
+        }
+
+model_router = ModelRouter()
+
+class RoutedChatModel:
+    """
+    Stands in for a chat model: ainvoke and abatch take a `task` and run each
+    prompt on the model the router picks. `factory(model)` returns the chat
+    model for a name.
+    """
+
+    def __init__(self, factory: Callable[[str], object], router: ModelRouter = model_router):
+        self.factory = factory
+        self.router = router
+
+    async def ainvoke(self, input, config=None, task: str = "default", **kwargs):
+        return await self.router.run(
+            task, input_tokens(input), lambda model: self.factory(model).ainvoke(input, config, **kwargs)
+        )
+
+    async def abatch(self, inputs: list, config=None, task: str = "default", **kwargs) -> list:
+        semaphore = asyncio.Semaphore((config or {}).get("max_concurrency") or len(inputs) or 1)
+
+        async def call(input):
+            async with semaphore:
+                return await self.ainvoke(input, task=task, **kwargs)
+
+        return await asyncio.gather(*(call(input) for input in inputs))
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Optional
+from dotenv import load_dotenv
+from urls import canonicalize_url
+
+load_dotenv()
+SCRAPE_CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH", ".cache/scrape.sqlite")
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", str(24 * 60 * 60)))
+SCRAPE_CACHE_MAX_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+class ScrapeCache:
+    """
+    On-disk cache of Firecrawl results keyed by canonicalized URL.
+    Entries expire after `ttl` seconds; once the stored content exceeds
+    `max_bytes`, the least recently read entries are evicted first.
+    """
+
+    def __init__(self, path: str = SCRAPE_CACHE_PATH, ttl: float = SCRAPE_CACHE_TTL, max_bytes: int = SCRAPE_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS scrapes (
+                    url TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS scrapes_accessed_at ON scrapes (accessed_at)")
+        return self._conn
+
+    def get(self, url: str) -> Optional[dict]:
+        key = canonicalize_url(url)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT content, created_at FROM scrapes WHERE url = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM scrapes WHERE url = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+            conn.execute("UPDATE scrapes SET accessed_at = ? WHERE url = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, url: str, content: dict):
+        key = canonicalize_url(url)
+        data = json.dumps(content, default=str)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO scrapes (url, content, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), now, now),
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM scrapes WHERE created_at < ?", (time.time() - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM scrapes").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT url, size FROM scrapes ORDER BY accessed_at").fetchall():
+            conn.execute("DELETE FROM scrapes WHERE url = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM scrapes")
+            conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM scrapes"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+scrape_cache = ScrapeCache()
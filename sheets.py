@@ -0,0 +1,295 @@
+import os
+import re
+import threading
+from typing import Callable, Optional, Dict, List
+import gspread
+from gspread.utils import rowcol_to_a1
+from dotenv import load_dotenv
+from metrics import track
+
+load_dotenv()
+GOOGLE_CREDENTIALS_FILE = os.getenv("GOOGLE_CREDENTIALS_FILE", "credentials.json")
+SHEETS_WRITE_BEHIND = os.getenv("SHEETS_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+SHEETS_FLUSH_INTERVAL = float(os.getenv("SHEETS_FLUSH_INTERVAL", "2.0"))
+SHEETS_FLUSH_MAX_CELLS = int(os.getenv("SHEETS_FLUSH_MAX_CELLS", "500"))
+
+# One authorized client per process, plus worksheet handles and header maps.
+# Everything is cached until invalidated explicitly.
+_lock = threading.RLock()
+_client: Optional[gspread.Client] = None
+_worksheets: Dict[str, gspread.Worksheet] = {}
+_headers: Dict[tuple, Dict[str, int]] = {}
+
+def get_client() -> gspread.Client:
+    """Returns the shared, authorized gspread client."""
+    global _client
+    with _lock:
+        if _client is None:
+            with track("sheets", "authorize"):
+                _client = gspread.service_account(filename=GOOGLE_CREDENTIALS_FILE)
+        return _client
+
+def set_client(client):
+    """Replaces the shared client (e.g. with an in-memory stand-in) and drops cached handles."""
+    global _client
+    with _lock:
+        _client = client
+        _worksheets.clear()
+        _headers.clear()
+
+def _worksheet_cache_key(sheet_name: Optional[str], key: Optional[str]) -> str:
+    if key:
+        return f"key:{key}"
+    if sheet_name:
+        return f"name:{sheet_name}"
+    raise ValueError("Either sheet_name or key is required.")
+
+def get_worksheet(sheet_name: Optional[str] = None, key: Optional[str] = None) -> gspread.Worksheet:
+    """
+    Returns the first worksheet of a spreadsheet, opened by key or by name.
+    Opening by key skips the Drive name search.
+    """
+    cache_key = _worksheet_cache_key(sheet_name, key)
+    with _lock:
+        worksheet = _worksheets.get(cache_key)
+        if worksheet is None:
+            gc = get_client()
+            with track("sheets", "open"):
+                spreadsheet = gc.open_by_key(key) if key else gc.open(sheet_name)
+                worksheet = spreadsheet.sheet1
+            _worksheets[cache_key] = worksheet
+        return worksheet
+
+def _header_cache_key(worksheet: gspread.Worksheet) -> tuple:
+    return (worksheet.spreadsheet_id, worksheet.id)
+
+def cache_headers(worksheet: gspread.Worksheet, header_row: List[str]) -> Dict[str, int]:
+    """Stores a header row that was already read as part of a larger range."""
+    header_map = {name: index for index, name in enumerate(header_row, start=1) if name}
+    with _lock:
+        _headers[_header_cache_key(worksheet)] = header_map
+    return header_map
+
+def get_headers(worksheet: gspread.Worksheet) -> Dict[str, int]:
+    """Returns a mapping of header name to 1-based column index."""
+    with _lock:
+        header_map = _headers.get(_header_cache_key(worksheet))
+    if header_map is None:
+        with track("sheets", "row_values"):
+            header_row = worksheet.row_values(1)
+        header_map = cache_headers(worksheet, header_row)
+    return header_map
+
+def column_index(worksheet: gspread.Worksheet, header: str) -> int:
+    """
+    Returns the 1-based column index of a header.
+    A miss re-reads the header row once in case columns were added or moved.
+    """
+    header_map = get_headers(worksheet)
+    if header not in header_map:
+        invalidate_headers(worksheet)
+        header_map = get_headers(worksheet)
+    if header not in header_map:
+        raise KeyError(f"Column '{header}' not found in sheet header.")
+    return header_map[header]
+
+def invalidate_headers(worksheet: Optional[gspread.Worksheet] = None):
+    """Drops the cached header map of a worksheet, or of all worksheets."""
+    with _lock:
+        if worksheet is None:
+            _headers.clear()
+        else:
+            _headers.pop(_header_cache_key(worksheet), None)
+
+def invalidate(sheet_name: Optional[str] = None, key: Optional[str] = None):
+    """
+    Drops a cached worksheet handle and its header map.
+    With no arguments, drops every handle and the client itself.
+    """
+    global _client
+    with _lock:
+        if sheet_name is None and key is None:
+            _worksheets.clear()
+            _headers.clear()
+            _client = None
+            return
+        worksheet = _worksheets.pop(_worksheet_cache_key(sheet_name, key), None)
+        if worksheet is not None:
+            _headers.pop(_header_cache_key(worksheet), None)
+
+def read_columns(worksheet: gspread.Worksheet, headers: List[str], start_row: int) -> Dict[str, List[str]]:
+    """
+    Reads the given columns from `start_row` down to the end of the sheet with
+    a single batch_get, so rows above it and the columns between are not fetched.
+    Columns are padded to the same length; empty cells are "".
+    """
+    indexes = [column_index(worksheet, header) for header in headers]
+    ranges = [f"{rowcol_to_a1(start_row, i)}:{re.sub(r'[0-9]', '', rowcol_to_a1(1, i))}" for i in indexes]
+    with track("sheets", "batch_get"):
+        results = worksheet.batch_get(ranges)
+    columns = {header: [row[0] if row else "" for row in values] for header, values in zip(headers, results)}
+    length = max((len(values) for values in columns.values()), default=0)
+    return {header: values + [""] * (length - len(values)) for header, values in columns.items()}
+
+def row_from_append_response(response: dict) -> int:
+    """Returns the row number written by append_row, e.g. 'Sheet1!A12:C12' -> 12."""
+    updated_range = response["updates"]["updatedRange"]
+    match = re.search(r"![A-Z]+(\d+)", updated_range)
+    if not match:
+        raise ValueError(f"Unexpected append range: {updated_range}")
+    return int(match.group(1))
+
+def _ranges(cells: Dict[tuple, str]) -> List[dict]:
+    """Groups {(row, col): value} into one range per run of adjacent cells in a row."""
+    ranges = []
+    for row, col in sorted(cells):
+        last = ranges[-1] if ranges else None
+        if last and last["row"] == row and last["end"] == col - 1:
+            last["values"].append(cells[(row, col)])
+            last["end"] = col
+        else:
+            ranges.append({"row": row, "start": col, "end": col, "values": [cells[(row, col)]]})
+    return [
+        {
+            "range": f"{rowcol_to_a1(r['row'], r['start'])}:{rowcol_to_a1(r['row'], r['end'])}",
+            "values": [r["values"]],
+        }
+        for r in ranges
+    ]
+
+def _cells(worksheet: gspread.Worksheet, row_index: int, values: Dict[str, str]) -> Dict[tuple, str]:
+    return {(row_index, column_index(worksheet, header)): value for header, value in values.items()}
+
+def update_row(worksheet: gspread.Worksheet, row_index: int, values: Dict[str, str]):
+    """Writes {header: value} into one row with a single batch_update call."""
+    ranges = _ranges(_cells(worksheet, row_index, values))
+    with track("sheets", "batch_update"):
+        worksheet.batch_update(ranges, value_input_option="USER_ENTERED")
+
+class SheetWriteQueue:
+    """
+    Write-behind queue that coalesces row updates from many agent runs.
+    Pending cells are merged (last write wins) and flushed as one
+    batch_update per worksheet, either on a timer or once enough cells pile up.
+    Callbacks registered with after_flush run once a row's cells are written.
+    """
+
+    def __init__(self, flush_interval: float = SHEETS_FLUSH_INTERVAL, max_cells: int = SHEETS_FLUSH_MAX_CELLS):
+        self.flush_interval = flush_interval
+        self.max_cells = max_cells
+        self._pending: Dict[tuple, Dict[tuple, str]] = {}
+        self._worksheets: Dict[tuple, gspread.Worksheet] = {}
+        self._flushing: Dict[tuple, Dict[tuple, str]] = {}
+        self._callbacks: Dict[tuple, Dict[int, List[Callable[[], None]]]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="sheet-write-queue", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, worksheet: gspread.Worksheet, row_index: int, values: Dict[str, str]):
+        cells = _cells(worksheet, row_index, values)
+        key = _header_cache_key(worksheet)
+        with self._lock:
+            self._worksheets[key] = worksheet
+            self._pending.setdefault(key, {}).update(cells)
+            size = sum(len(p) for p in self._pending.values())
+        self.start()
+        if size >= self.max_cells:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(p) for p in self._pending.values())
+
+    def _rows(self, cells: Dict[tuple, str]) -> set:
+        return {row for row, _ in cells}
+
+    def after_flush(self, worksheet: gspread.Worksheet, row_index: int, callback: Callable[[], None]):
+        """Calls `callback` once the cells queued for a row are written, or right away if there are none."""
+        key = _header_cache_key(worksheet)
+        with self._lock:
+            queued = self._rows(self._pending.get(key, {})) | self._rows(self._flushing.get(key, {}))
+            if row_index in queued:
+                self._callbacks.setdefault(key, {}).setdefault(row_index, []).append(callback)
+                return
+        callback()
+
+    def _written(self, key: tuple, cells: Dict[tuple, str]) -> List[Callable[[], None]]:
+        """Pops the callbacks of the rows in `cells` that have nothing queued any more."""
+        still_queued = self._rows(self._pending.get(key, {}))
+        callbacks = self._callbacks.get(key, {})
+        done = []
+        for row in self._rows(cells) - still_queued:
+            done.extend(callbacks.pop(row, []))
+        return done
+
+    def flush(self):
+        """Writes everything that is pending. Failed writes are put back in the queue."""
+        with self._flush_lock:
+            with self._lock:
+                batches = self._pending
+                self._pending = {}
+                self._flushing = dict(batches)
+            for key, cells in batches.items():
+                worksheet = self._worksheets[key]
+                try:
+                    with track("sheets", "batch_update"):
+                        worksheet.batch_update(_ranges(cells), value_input_option="USER_ENTERED")
+                    print(f"Flushed {len(cells)} cells to '{worksheet.title}'.")
+                except Exception as e:
+                    print(f"Failed to flush sheet writes, will retry: {e}")
+                    with self._lock:
+                        # Newer values queued in the meantime take precedence.
+                        self._pending[key] = {**cells, **self._pending.get(key, {})}
+                        self._flushing.pop(key, None)
+                    continue
+                with self._lock:
+                    self._flushing.pop(key, None)
+                    callbacks = self._written(key, cells)
+                for callback in callbacks:
+                    try:
+                        callback()
+                    except Exception as e:
+                        print(f"Sheet write callback failed: {e}")
+
+    def close(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self.pending():
+                self.flush()
+
+write_queue = SheetWriteQueue()
+
+def write_row(worksheet: gspread.Worksheet, row_index: int, values: Dict[str, str]) -> bool:
+    """
+    Writes a row update, through the write-behind queue when SHEETS_WRITE_BEHIND is set.
+    Returns True if the write was queued rather than applied.
+    """
+    if SHEETS_WRITE_BEHIND:
+        write_queue.enqueue(worksheet, row_index, values)
+        return True
+    update_row(worksheet, row_index, values)
+    return False
+
+def after_write(worksheet: gspread.Worksheet, row_index: int, callback: Callable[[], None]):
+    """Calls `callback` once the writes queued for a row have reached the sheet (right away without write-behind)."""
+    write_queue.after_flush(worksheet, row_index, callback)
+
+def flush_writes():
+    """Flushes the write-behind queue and stops its worker thread."""
+    write_queue.close()
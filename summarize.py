@@ -0,0 +1,106 @@
+import os
+from typing import List
+from dotenv import load_dotenv
+from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
+
+load_dotenv()
+# Articles above this many tokens are summarized with map-reduce
+SUMMARY_MAP_REDUCE_THRESHOLD = int(os.getenv("SUMMARY_MAP_REDUCE_THRESHOLD", "6000"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "4"))
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """
+    Counts tokens with tiktoken's cl100k_base as a proxy for Gemini's tokenizer.
+    Falls back to ~4 characters per token if the encoding cannot be loaded.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"tiktoken unavailable, estimating token counts: {e}")
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+def article_text(scraped_content) -> str:
+    """Returns the markdown body of a Firecrawl result, or the content as text."""
+    if isinstance(scraped_content, dict) and scraped_content.get("markdown"):
+        return scraped_content["markdown"]
+    return str(scraped_content)
+
+def split_sections(text: str, chunk_tokens: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+    """
+    Splits markdown on heading boundaries, breaks up sections that are still
+    too long, then packs adjacent sections into chunks of up to chunk_tokens.
+    """
+    header_splitter = MarkdownHeaderTextSplitter(
+        [("#", "h1"), ("##", "h2"), ("###", "h3")],
+        strip_headers=False,
+    )
+    section_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_tokens,
+        chunk_overlap=0,
+        length_function=count_tokens,
+    )
+    sections = []
+    for document in header_splitter.split_text(text):
+        sections.extend(section_splitter.split_text(document.page_content))
+
+    chunks, current, current_tokens = [], [], 0
+    for section in sections:
+        tokens = count_tokens(section)
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(section)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def summary_prompt(content: str) -> str:
+    return f"""
+    Article Content: {content}
+    Write a concise summary of the above content. (500 words)
+    """
+
+def map_prompt(chunk: str, part: int, total: int) -> str:
+    return f"""
+    Article Excerpt (part {part} of {total}): {chunk}
+    Summarize the key points, facts, figures and quotes of this excerpt. (150 words)
+    """
+
+def reduce_prompt(partial_summaries: List[str]) -> str:
+    sections = "\n\n".join(f"Part {i}: {summary}" for i, summary in enumerate(partial_summaries, start=1))
+    return f"""
+    Section Summaries: {sections}
+    The above are summaries of consecutive sections of one article.
+    Write a concise summary of the whole article. (500 words)
+    """
+
+async def summarize_content(llm, scraped_content) -> str:
+    """
+    Summarizes scraped content in one call, or with map-reduce when the
+    article is longer than SUMMARY_MAP_REDUCE_THRESHOLD tokens.
+    """
+    text = article_text(scraped_content)
+    tokens = count_tokens(text)
+    if tokens <= SUMMARY_MAP_REDUCE_THRESHOLD:
+        response = await llm.ainvoke(summary_prompt(text), task="summarize")
+        return response.content
+
+    chunks = split_sections(text)
+    print(f'Long article ({tokens} tokens), summarizing {len(chunks)} chunks')
+    partial = await llm.abatch(
+        [map_prompt(chunk, i, len(chunks)) for i, chunk in enumerate(chunks, start=1)],
+        config={"max_concurrency": SUMMARY_MAX_CONCURRENCY},
+        task="summarize_chunk",
+    )
+    response = await llm.ainvoke(reduce_prompt([response.content for response in partial]), task="summarize_reduce")
+    return response.content
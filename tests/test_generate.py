@@ -0,0 +1,37 @@
+import asyncio
+import httpx
+import pytest
+from openai import BadRequestError
+import generate
+
+def bad_request(message: str, param=None) -> BadRequestError:
+    body = {"message": message, "param": param}
+    response = httpx.Response(400, request=httpx.Request("POST", "https://example.com/chat/completions"))
+    return BadRequestError(f"Error code: 400 - {{'error': {body}}}", response=response, body=body)
+
+@pytest.mark.parametrize("error", [
+    bad_request("n > 1 is not supported"),
+    bad_request("Multiple candidates is not enabled for models/gemini-2.5-flash"),
+    bad_request("Unsupported parameter: 'n'"),
+    bad_request("Invalid value", param="n"),
+])
+def test_recognizes_rejected_n(error):
+    assert generate._rejects_n(error)
+
+@pytest.mark.parametrize("error", [
+    bad_request("The input token count (1200000) exceeds the maximum number of tokens allowed (1048576)."),
+    bad_request("Invalid value at 'temperature'", param="temperature"),
+    bad_request("Request contains an invalid argument.\\n Please check the request"),
+])
+def test_other_bad_requests_are_not_about_n(error):
+    assert not generate._rejects_n(error)
+
+def test_other_bad_requests_are_raised_and_keep_n(monkeypatch):
+    async def create_draft(user_context, **kwargs):
+        raise bad_request("The input token count exceeds the maximum number of tokens allowed.")
+
+    monkeypatch.setattr(generate, "create_draft", create_draft)
+    monkeypatch.setattr(generate, "_n_supported", None)
+    with pytest.raises(BadRequestError):
+        asyncio.run(generate.generate_variants("context", variants=3))
+    assert generate._n_supported is None
@@ -0,0 +1,81 @@
+import pytest
+from preprocess import clean_markdown, truncate_to_tokens
+from summarize import count_tokens
+
+ARTICLE = """[Skip to content](#main)
+
+* [Home](https://news.example.com/)
+* [World](https://news.example.com/world)
+* [Business](https://news.example.com/business)
+
+We use cookies to improve your experience. [Accept all](#) [Manage settings](#)
+
+# Chipmaker opens a new plant
+
+![Hero image](https://news.example.com/hero.jpg)
+
+The company said the plant will employ 2,000 people when it opens next year.
+
+Advertisement
+
+Read more: [Related story](https://news.example.com/related/1)
+
+[Share on LinkedIn](https://linkedin.com/share) [Share on X](https://x.com/share)
+
+Follow us on LinkedIn, X & Facebook
+
+Subscribe to our newsletter for the latest stories.
+
+Privacy policy | Terms of use | Cookie settings
+
+© 2025 Example News. All rights reserved."""
+
+def test_removes_navigation_banners_and_footers():
+    assert clean_markdown(ARTICLE) == (
+        "# Chipmaker opens a new plant\n\n"
+        "The company said the plant will employ 2,000 people when it opens next year."
+    )
+
+@pytest.mark.parametrize("paragraph", [
+    "Sign up for the beta program, which lets developers test the new API before launch.",
+    "Cookies are small text files that websites store in your browser.",
+    "Browsers now block third-party cookies by default.",
+    "Copyright law protects original works for decades after the author's death.",
+    "Users who log in with a passkey never type a password.",
+    "Readers can subscribe for $5 a month, the company said.",
+    "Read more about the study in the journal Nature.",
+    "The newsletter reached a million readers in March.",
+    "Share prices on the exchange rose 4% on Tuesday.",
+    "(c) Members must vote before the deadline.",
+])
+def test_keeps_short_article_sentences_that_mention_banner_words(paragraph):
+    text = f"# Heading\n\n{paragraph}\n\nAnother paragraph of the article body."
+    assert paragraph in clean_markdown(text)
+
+def test_keeps_prose_with_a_few_links():
+    paragraph = "Read the [full report](https://who.int/report) from the [World Health Organization](https://who.int)."
+    assert "Read the full report from the World Health Organization." in clean_markdown(paragraph)
+
+def test_removes_blocks_that_are_mostly_links():
+    text = "Body text of the article.\n\n[Markets](/markets) [Tech](/tech) [Climate](/climate) and [Health news](/health)"
+    assert clean_markdown(text) == "Body text of the article."
+
+def test_removes_repeated_blocks():
+    assert clean_markdown("Same paragraph here.\n\nSame paragraph here!") == "Same paragraph here."
+
+def test_truncates_at_a_paragraph_boundary():
+    text = "First paragraph of the article.\n\n" + "Second paragraph. " * 50
+    assert truncate_to_tokens(text, 20) == ("First paragraph of the article.", True)
+
+def test_cuts_a_single_paragraph_over_the_budget_at_a_sentence():
+    paragraph = " ".join(f"Sentence number {i} of one very long paragraph." for i in range(200))
+    text, truncated = truncate_to_tokens(paragraph, 50)
+    assert truncated
+    assert text.startswith("Sentence number 0 of") and text.endswith(".")
+    assert 0 < count_tokens(text) <= 50
+
+def test_cuts_a_paragraph_without_sentence_ends_to_the_budget():
+    paragraph = "word " * 1000
+    text, truncated = truncate_to_tokens(paragraph, 30)
+    assert truncated and text.startswith("word")
+    assert 0 < count_tokens(text) <= 30
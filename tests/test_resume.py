@@ -0,0 +1,31 @@
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+import main
+from agent import row_run_id
+from checkpoints import CheckpointStore
+from jobs import JobQueue
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "checkpoint_store", CheckpointStore(path=str(tmp_path / "checkpoints.sqlite")))
+    # Not started, so submitted runs stay queued
+    monkeypatch.setattr(main, "job_queue", JobQueue(main.get_agent))
+    return TestClient(main.app)
+
+def test_resumes_failed_backlog_row(client):
+    run_id = row_run_id(str(uuid.uuid4()), 7)
+    initial_state = {"url": "https://example.com/a", "sheet_row_index": 7, "run_id": run_id}
+    main.checkpoint_store.start(run_id, initial_state)
+    main.checkpoint_store.save(run_id, "scrape", {"scraped_content_id": "abc"}, sheet_row_index=7)
+    main.checkpoint_store.fail(run_id, "post_content", "Post failed")
+
+    response = client.post(f"/runs/{run_id}/resume")
+
+    assert response.status_code == 202
+    assert response.json()["run_id"] == run_id
+    job = main.job_queue.get(response.json()["job_id"])
+    assert job["_initial_state"] == initial_state
+
+def test_resume_of_unknown_run_is_404(client):
+    assert client.post(f"/runs/{row_run_id('missing', 3)}/resume").status_code == 404
@@ -0,0 +1,54 @@
+import pytest
+from sheets import SheetWriteQueue
+
+class FakeWorksheet:
+    spreadsheet_id = "sheet"
+    id = 0
+    title = "News Media Links"
+
+    def __init__(self):
+        self.updates = []
+        self.fail = False
+
+    def row_values(self, row):
+        return ["Media Links", "LinkedIn Content", "LinkedIn Status"]
+
+    def batch_update(self, ranges, value_input_option=None):
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+        self.updates.append(ranges)
+
+@pytest.fixture
+def queue():
+    # Never started, so writes only go out on flush()
+    queue = SheetWriteQueue(flush_interval=3600)
+    queue.start = lambda: None
+    return queue
+
+def test_callback_waits_for_the_rows_write(queue):
+    worksheet, released = FakeWorksheet(), []
+    queue.enqueue(worksheet, 5, {"LinkedIn Status": "Posted."})
+    queue.after_flush(worksheet, 5, lambda: released.append(5))
+    assert released == []
+
+    queue.flush()
+
+    assert worksheet.updates and released == [5]
+
+def test_callback_runs_at_once_without_queued_writes(queue):
+    worksheet, released = FakeWorksheet(), []
+    queue.enqueue(worksheet, 5, {"LinkedIn Status": "Posted."})
+    queue.after_flush(worksheet, 6, lambda: released.append(6))
+    assert released == [6]
+
+def test_failed_flush_keeps_the_callback_waiting(queue):
+    worksheet, released = FakeWorksheet(), []
+    queue.enqueue(worksheet, 5, {"LinkedIn Status": "Posted."})
+    queue.after_flush(worksheet, 5, lambda: released.append(5))
+    worksheet.fail = True
+    queue.flush()
+    assert released == [] and queue.pending() == 1
+
+    worksheet.fail = False
+    queue.flush()
+    assert released == [5]
@@ -0,0 +1,44 @@
+import pytest
+from urls import canonicalize_url
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://www.example.com/story", "https://example.com/story"),
+    ("https://amp.example.com/story", "https://example.com/story"),
+    ("https://m.example.co.uk/story", "https://example.co.uk/story"),
+    ("https://www.m.example.com/story", "https://example.com/story"),
+])
+def test_strips_host_prefixes(url, expected):
+    assert canonicalize_url(url) == expected
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://amp.dev/docs", "https://amp.dev/docs"),
+    ("https://m.com/x", "https://m.com/x"),
+    ("https://www.com/", "https://www.com/"),
+    ("https://www.amp.dev/docs", "https://amp.dev/docs"),
+])
+def test_keeps_prefix_when_only_a_tld_would_be_left(url, expected):
+    assert canonicalize_url(url) == expected
+
+def test_prefixed_bare_domains_stay_distinct():
+    assert canonicalize_url("https://amp.dev/docs") != canonicalize_url("https://m.dev/docs")
+
+def test_normalizes_scheme_case_port_and_trailing_slash():
+    assert canonicalize_url("HTTP://Example.COM:443/Story/") == "https://example.com/Story"
+    assert canonicalize_url("https://example.com:8080/a") == "https://example.com:8080/a"
+
+def test_drops_tracking_and_amp_params_and_sorts_query():
+    url = "https://example.com/a?utm_source=x&b=2&fbclid=y&a=1&amp=1#section"
+    assert canonicalize_url(url) == "https://example.com/a?a=1&b=2"
+
+@pytest.mark.parametrize("path, expected", [
+    ("/story/amp", "/story"),
+    ("/amp/story", "/story"),
+    ("/story.amp", "/story"),
+    ("/story.amp.html", "/story.html"),
+])
+def test_strips_amp_paths(path, expected):
+    assert canonicalize_url(f"https://example.com{path}") == f"https://example.com{expected}"
+
+def test_unwraps_google_amp_cache_links():
+    url = "https://www-example-com.cdn.ampproject.org/c/s/www.example.com/story/amp?utm_medium=x"
+    assert canonicalize_url(url) == "https://example.com/story"
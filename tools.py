@@ -1,166 +1,207 @@
 import os
 import gspread
 from langchain.tools import tool
-from firecrawl import Firecrawl
-from typing import Optional
+from typing import Optional, List, Tuple
 from dotenv import load_dotenv
-import requests
-import tweepy
+import sheets
+from scrape_cache import scrape_cache
+from publisher import publisher
+from metrics import track
+from watcher import claim_new_rows, sheet_cursor
 
 load_dotenv() 
 
-firecrawl = Firecrawl(api_key=os.getenv("FIRECRAWL_API_KEY"))
+_firecrawl = None
+
+def get_firecrawl():
+    """Returns the shared Firecrawl client, created by the first scrape."""
+    global _firecrawl
+    if _firecrawl is None:
+        from firecrawl import Firecrawl
+        _firecrawl = Firecrawl(
+            api_key=os.getenv("FIRECRAWL_API_KEY"),
+            api_url=os.getenv("FIRECRAWL_API_URL", "https://api.firecrawl.dev"),
+        )
+    return _firecrawl
 
 @tool
 def add_url_to_sheet(sheet_name: str, link_column: str, url: str) -> int:
     """
     Adds a new URL to the specified Google Sheet column and returns the new row number.
+    The row is claimed for the caller's run, so the sheet watcher and backlogs skip it.
     """
     try:
-        gc = gspread.service_account(filename="credentials.json")
-        worksheet = gc.open(sheet_name).sheet1
-        col_index = worksheet.find(link_column).col
-        worksheet.append_row([url], value_input_option='USER_ENTERED')
-        row_number = len(worksheet.col_values(col_index))
+        worksheet = sheets.get_worksheet(sheet_name)
+        col_index = sheets.column_index(worksheet, link_column)
+        row = [""] * (col_index - 1) + [url]
+        with track("sheets", "append_row"):
+            response = worksheet.append_row(row, value_input_option='USER_ENTERED')
+        row_number = sheets.row_from_append_response(response)
+        sheet_cursor.claim(sheet_name, [row_number])
         
         print(f"URL added to row {row_number}.")
         return row_number
         
     except Exception as e:
         print(f"Failed to add URL to Google Sheet: {e}")
+        sheets.invalidate(sheet_name)
         raise e
     
 @tool
-def get_article_url(sheet_name: str, link_column: str) -> Optional[str]:
+def get_article_url(sheet_name: str, link_column: str, status_columns: Optional[List[str]] = None) -> Optional[str]:
     """
-    Fetches the single latest news media link from the last row of a specified Google Sheet.
-    The sheet must have a column for the links.
+    Fetches the next unprocessed news media link below the sheet's cursor and moves the cursor past it.
+    The sheet must have a column for the links. A link is unprocessed while its status columns are empty.
     """
     try:
-        gc = gspread.service_account(filename="credentials.json")
-        worksheet = gc.open(sheet_name).sheet1
-        col_index = worksheet.find(link_column).col
-        links = worksheet.col_values(col_index)
-
-        if not links or len(links) <= 1:
-            print("No links found or only a header row exists.")
+        rows = claim_new_rows(sheet_name, link_column, status_columns or ["LinkedIn Status"], limit=1)
+        if not rows:
+            print("No new links found.")
             return None
-        
-        # Get the latest URL (last row) and its 1-based row index
-        latest_url = links[-1]
-        row_number = len(links) 
-
-        return latest_url, row_number
+        # The oldest new URL and its 1-based row index
+        return rows[0]
     except gspread.exceptions.SpreadsheetNotFound:
         print(f"Error: Spreadsheet '{sheet_name}' not found.")
         return None
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
+        sheets.invalidate(sheet_name)
         return None
     
 @tool
-def scrape_article(url: str) -> Optional[str]:
+def get_unprocessed_urls(sheet_name: str, link_column: str, status_columns: Optional[List[str]] = None, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+    """
+    Fetches every link in the sheet whose status columns are all still empty
+    and that no other run has claimed, and claims them.
+    Returns (url, row_number) pairs in sheet order, oldest first.
+    """
+    try:
+        worksheet = sheets.get_worksheet(sheet_name)
+        with track("sheets", "get_all_values"):
+            rows = worksheet.get_all_values()
+
+        if not rows or len(rows) <= 1:
+            print("No links found or only a header row exists.")
+            return []
+
+        headers = sheets.cache_headers(worksheet, rows[0])
+        link_index = headers[link_column] - 1
+        status_indexes = [headers[column] - 1 for column in status_columns or ["LinkedIn Status"] if column in headers]
+        in_flight = sheet_cursor.claimed(sheet_name)
+
+        pending = []
+        for row_number, row in enumerate(rows[1:], start=2):
+            url = row[link_index].strip() if link_index < len(row) else ""
+            processed = any(index < len(row) and row[index].strip() for index in status_indexes)
+            if url and not processed and row_number not in in_flight:
+                pending.append((url, row_number))
+                if limit and len(pending) >= limit:
+                    break
+
+        won = set(sheet_cursor.claim(sheet_name, [row_number for _, row_number in pending]))
+        pending = [(url, row_number) for url, row_number in pending if row_number in won]
+        print(f"Found {len(pending)} unprocessed links.")
+        return pending
+    except gspread.exceptions.SpreadsheetNotFound:
+        print(f"Error: Spreadsheet '{sheet_name}' not found.")
+        return []
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        sheets.invalidate(sheet_name)
+        return []
+
+@tool
+def scrape_article(url: str, bypass_cache: bool = False) -> Optional[dict]:
     """
     Scrapes the content of a single URL using the FirecrawlScrapeTool.
+    Results are served from the on-disk scrape cache unless bypass_cache is set.
     """
+    if not bypass_cache:
+        cached = scrape_cache.get(url)
+        if cached is not None:
+            print(f"Scrape cache hit: {url}")
+            return cached
     try:
         print(f"Scraping URL: {url}")
-        content = firecrawl.scrape(
-            url,
-            formats=["markdown"]
-        )
+        with track("firecrawl", "scrape"):
+            content = get_firecrawl().scrape(
+                url,
+                formats=["markdown"]
+            )
+        if hasattr(content, "model_dump"):
+            content = content.model_dump(exclude_none=True)
         print("Scraping successful.")
+        scrape_cache.set(url, content)
         return content
     except Exception as e:
         print(f"An error occurred while scraping: {e}")
         return None
 
-@tool
-def post_to_twitter(tweet_content: str):
-    """Posts content to Twitter (X)."""
-    try:
-        consumer_key = os.getenv("TWITTER_CONSUMER_KEY")
-        consumer_secret = os.getenv("TWITTER_CONSUMER_SECRET")
-        access_token = os.getenv("TWITTER_ACCESS_TOKEN")
-        access_token_secret = os.getenv("TWITTER_ACCESS_TOKEN_SECRET")
+# The publish log already holds this post for the same request, so it was not sent again
+DUPLICATE_STATUS = "Already posted (duplicate suppressed)."
 
-        if not all([consumer_key, consumer_secret, access_token, access_token_secret]):
-            raise ValueError("Twitter API credentials are not set.")
+def _post_status(result: dict, posted: str) -> str:
+    if result["status"] == "posted":
+        return posted
+    if result["status"] == "duplicate":
+        return DUPLICATE_STATUS
+    return f"Post failed: {result['error']}"
 
-        auth = tweepy.OAuth1UserHandler(
-            consumer_key, consumer_secret, access_token, access_token_secret
-        )
-        api = tweepy.API(auth)
-        api.update_status(tweet_content)
+@tool
+async def post_to_twitter(tweet_content: str, scope: Optional[str] = None):
+    """Posts content to Twitter (X). Retries with the same scope are not posted twice."""
+    result = await publisher.publish_twitter(tweet_content, scope=scope)
+    if result["status"] == "failed":
+        print(f"Failed to post to Twitter: {result['error']}")
+    elif result["status"] == "duplicate":
+        print("Tweet was already posted for this run.")
+    else:
         print("Successfully posted to Twitter.")
-        return "Posted"
-    except Exception as e:
-        print(f"Failed to post to Twitter: {e}")
-        return f"Post failed: {e}"
+    return _post_status(result, "Posted")
 
 @tool
-def post_to_linkedin(post_content: str):
-    """Posts content to LinkedIn."""
+async def post_to_linkedin(post_content: str, scope: Optional[str] = None):
+    """Posts content to LinkedIn. Retries with the same scope are not posted twice."""
     access_token = os.getenv("LINKEDIN_ACCESS_TOKEN")
     company_id = os.getenv("LINKEDIN_COMPANY_ID") 
 
     if not access_token or not company_id:
         return "Post failed: Missing credentials."
-    
-    url = "https://api.linkedin.com/v2/ugcPosts"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-    }
-    payload = {
-        "author": f"urn:li:person:{os.getenv('LINKEDIN_PERSON_URN')}", 
-        "lifecycleState": "PUBLISHED",
-        "specificContent": {
-            "com.linkedin.ugc.ShareContent": {
-                "shareCommentary": {
-                    "text": post_content
-                },
-                "shareMediaCategory": "NONE"
-            }
-        },
-        "visibility": {
-            "com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"
-        }
-    }
 
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        id = response.json().get("id", "N/A")
-        print(f"Post ID: {id}")
-        return "Posted."
-    except requests.exceptions.HTTPError as err:
-        print(f"Response: {response.text}")
-        return f"Post failed: {err}"
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return f"Post failed: {e}"
+    result = await publisher.publish_linkedin(
+        post_content,
+        access_token=access_token,
+        author_urn=f"urn:li:person:{os.getenv('LINKEDIN_PERSON_URN')}",
+        scope=scope,
+    )
+    print(f"Post ID: {result['id']}" if result["id"] else f"LinkedIn post failed: {result['error']}")
+    return _post_status(result, "Posted.")
     
 @tool
-# def update_google_sheet(sheet_name: str, link_column: str, row_index: int, linkedin_content: str, twitter_content: str, linkedin_status: str, twitter_status: str):
-def update_google_sheet(sheet_name: str, link_column: str, row_index: int, linkedin_content: str, linkedin_status: str):
+def update_google_sheet(sheet_name: str, link_column: str, row_index: int, linkedin_content: Optional[str] = None, linkedin_status: Optional[str] = None, twitter_content: Optional[str] = None, twitter_status: Optional[str] = None):
     """Updates a row in a Google Sheet with post content and status."""
     try:
-        gc = gspread.service_account(filename="credentials.json")
-        worksheet = gc.open(sheet_name).sheet1
-
-        # Assuming columns for content and status are defined
-        headers = worksheet.row_values(1)
-        linkedin_col_index = headers.index("LinkedIn Content") + 1
-        # twitter_col_index = headers.index("Twitter Content") + 1
-        linkedin_status_col_index = headers.index("LinkedIn Status") + 1
-        # twitter_status_col_index = headers.index("Twitter Status") + 1
-
-        worksheet.update_cell(row_index, linkedin_col_index, linkedin_content)
-        # worksheet.update_cell(row_index, twitter_col_index, twitter_content)
-        worksheet.update_cell(row_index, linkedin_status_col_index, linkedin_status)
-        # worksheet.update_cell(row_index, twitter_status_col_index, twitter_status)
-        print(f"Successfully updated row {row_index + 1} in Google Sheet.")
+        worksheet = sheets.get_worksheet(sheet_name)
+
+        values = {
+            "LinkedIn Content": linkedin_content,
+            "LinkedIn Status": linkedin_status,
+            "Twitter Content": twitter_content,
+            "Twitter Status": twitter_status,
+        }
+        # Only write platforms that ran, and only into columns the sheet has
+        headers = sheets.get_headers(worksheet)
+        values = {column: value for column, value in values.items() if value is not None and column in headers}
+        if not values:
+            return "Nothing to update"
+
+        queued = sheets.write_row(worksheet, row_index, values)
+        if queued:
+            print(f"Queued update for row {row_index} in Google Sheet.")
+            return "Sheet update queued"
+        print(f"Successfully updated row {row_index} in Google Sheet.")
         return "Sheet updated successfully"
     except Exception as e:
         print(f"Failed to update Google Sheet: {e}")
+        sheets.invalidate(sheet_name)
         return f"Sheet update failed: {e}"
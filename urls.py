@@ -0,0 +1,62 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "ref_url", "cmpid", "smid", "share", "src", "spm",
+}
+TRACKING_PREFIXES = ("utm_", "at_", "pk_", "hsa_", "__hs", "_hs")
+# Query parameters that select an AMP rendering of the same page
+AMP_PARAMS = {"amp", "amp_js_v", "amp_gsa", "usqp", "outputtype"}
+# Google's AMP cache serves pages as https://<host>.cdn.ampproject.org/c/s/<origin host>/<path>
+AMP_CACHE_PATH = re.compile(r"^/[a-z](?:/s)?/(?P<host>[^/]+)(?P<path>/.*)?$")
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def _strip_amp_path(path: str) -> str:
+    # /story/amp, /amp/story, /story.amp and /story.amp.html all point at /story(.html)
+    segments = [s for s in path.split("/") if s.lower() != "amp"]
+    if segments and segments[-1].lower().endswith(".amp"):
+        segments[-1] = segments[-1][:-4]
+    elif segments and ".amp." in segments[-1].lower():
+        name, _, ext = segments[-1].rpartition(".")
+        segments[-1] = f"{name[:-4]}.{ext}"
+    return "/".join(segments) or "/"
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalizes a URL so that trivially different links map to the same key.
+    Lowercases scheme and host, drops default ports, 'www.', 'amp.' and 'm.'
+    host prefixes (unless only a TLD would be left), fragments, tracking and AMP parameters, AMP path variants
+    and trailing slashes, unwraps Google AMP cache links and sorts the query string.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.endswith(".cdn.ampproject.org"):
+        match = AMP_CACHE_PATH.match(parts.path)
+        if match:
+            return canonicalize_url(f"https://{match['host']}{match['path'] or '/'}?{parts.query}")
+
+    scheme = (parts.scheme or "https").lower()
+    if scheme == "http":
+        scheme = "https"
+
+    for prefix in ("www.", "amp.", "m."):
+        # Only when a registrable domain is left: amp.dev and m.com are sites of their own
+        if host.startswith(prefix) and "." in host[len(prefix):]:
+            host = host[len(prefix):]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = _strip_amp_path(parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(k) and k.lower() not in AMP_PARAMS
+    ]
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
@@ -0,0 +1,185 @@
+import os
+import time
+import functools
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+from dotenv import load_dotenv
+import sheets
+
+load_dotenv()
+SHEET_CURSOR_PATH = os.getenv("SHEET_CURSOR_PATH", ".cache/sheet_cursor.sqlite")
+# Claims of rows whose run never released them (e.g. the server died) lapse after this long
+SHEET_CLAIM_TTL = float(os.getenv("SHEET_CLAIM_TTL", str(6 * 60 * 60)))
+# The sheet column each platform writes its post status to. A row is processed
+# once any of the columns of the platforms the agent posts to is filled.
+PLATFORM_STATUS_COLUMNS = {"linkedin": "LinkedIn Status", "twitter": "Twitter Status"}
+
+class SheetCursor:
+    """
+    Persisted cursor per sheet: the last row that has been handed to the agent.
+    Moves are compare-and-set, so the sheet watcher and the /run-agent fetch
+    path never hand out the same row twice.
+
+    Also holds the claims of rows that have a run in flight, wherever the row
+    came from (appended by /run-agent, the watcher, the fetch path or a
+    backlog), so no other entry point starts a second run for them.
+    """
+
+    def __init__(self, path: str = SHEET_CURSOR_PATH, claim_ttl: float = SHEET_CLAIM_TTL):
+        self.path = path
+        self.claim_ttl = claim_ttl
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cursors (
+                    sheet TEXT PRIMARY KEY,
+                    last_row INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS claims (
+                    sheet TEXT NOT NULL,
+                    row INTEGER NOT NULL,
+                    claimed_at REAL NOT NULL,
+                    PRIMARY KEY (sheet, row)
+                )
+                """
+            )
+        return self._conn
+
+    def get(self, sheet: str) -> Optional[int]:
+        with self._lock:
+            row = self._connection().execute("SELECT last_row FROM cursors WHERE sheet = ?", (sheet,)).fetchone()
+        return row[0] if row else None
+
+    def move(self, sheet: str, from_row: Optional[int], to_row: int) -> bool:
+        """Sets the cursor to `to_row` if it is still at `from_row` (None: not set yet)."""
+        with self._lock:
+            conn = self._connection()
+            if from_row is None:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO cursors (sheet, last_row, updated_at) VALUES (?, ?, ?)",
+                    (sheet, to_row, time.time()),
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE cursors SET last_row = ?, updated_at = ? WHERE sheet = ? AND last_row = ?",
+                    (to_row, time.time(), sheet, from_row),
+                )
+            conn.commit()
+            return cursor.rowcount == 1
+
+    def claimed(self, sheet: str) -> Set[int]:
+        """Rows of the sheet that have a run in flight."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT row FROM claims WHERE sheet = ? AND claimed_at > ?", (sheet, time.time() - self.claim_ttl)
+            ).fetchall()
+        return {row for (row,) in rows}
+
+    def claim(self, sheet: str, rows: Iterable[int]) -> List[int]:
+        """Claims the rows that are not claimed yet and returns them."""
+        now = time.time()
+        claimed = []
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM claims WHERE claimed_at <= ?", (now - self.claim_ttl,))
+            for row in rows:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO claims (sheet, row, claimed_at) VALUES (?, ?, ?)", (sheet, row, now)
+                )
+                if cursor.rowcount == 1:
+                    claimed.append(row)
+            conn.commit()
+        return claimed
+
+    def release(self, sheet: str, rows: Iterable[int]):
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("DELETE FROM claims WHERE sheet = ? AND row = ?", [(sheet, row) for row in rows])
+            conn.commit()
+
+    def reset(self, sheet: str):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM cursors WHERE sheet = ?", (sheet,))
+            conn.commit()
+
+sheet_cursor = SheetCursor()
+
+def release_when_written(sheet_name: str, rows: Iterable[int]):
+    """
+    Releases the claims of finished rows. With SHEETS_WRITE_BEHIND a row stays
+    claimed until its queued status write has been flushed, so it is not
+    picked up again while its status still reads empty.
+    """
+    rows = list(rows)
+    if not sheets.SHEETS_WRITE_BEHIND:
+        sheet_cursor.release(sheet_name, rows)
+        return
+    worksheet = sheets.get_worksheet(sheet_name)
+    for row in rows:
+        sheets.after_write(worksheet, row, functools.partial(sheet_cursor.release, sheet_name, [row]))
+
+def _start_row(worksheet, sheet_name: str, link_column: str) -> int:
+    """
+    The cursor of a sheet seen for the first time starts just before its last
+    link, so only the newest row is picked up, as the fetch path always did.
+    """
+    links = sheets.read_columns(worksheet, [link_column], 2)[link_column]
+    while links and not links[-1].strip():
+        links.pop()
+    last_row = max(1, len(links))
+    sheet_cursor.move(sheet_name, None, last_row)
+    return sheet_cursor.get(sheet_name)
+
+def claim_new_rows(sheet_name: str, link_column: str, status_columns: Sequence[str] = ("LinkedIn Status",), limit: Optional[int] = None) -> List[Tuple[str, int]]:
+    """
+    Returns the (url, row_number) pairs added below the cursor whose status
+    columns are all still empty, oldest first, moves the cursor past them and
+    claims them. Rows another run has claimed (e.g. appended by /run-agent)
+    are passed over. Only the link and status columns below the cursor are read.
+    """
+    if limit is not None and limit < 1:
+        return []
+    worksheet = sheets.get_worksheet(sheet_name)
+    after = sheet_cursor.get(sheet_name)
+    if after is None:
+        after = _start_row(worksheet, sheet_name, link_column)
+
+    headers = sheets.get_headers(worksheet)
+    status_columns = [column for column in status_columns if column in headers]
+    values = sheets.read_columns(worksheet, [link_column] + status_columns, after + 1)
+    links = values[link_column]
+    statuses = [[values[column][i] for column in status_columns] for i in range(len(links))]
+    in_flight = sheet_cursor.claimed(sheet_name)
+
+    claimed, last_row = [], after
+    for offset, (url, status) in enumerate(zip(links, statuses)):
+        row_number = after + 1 + offset
+        if url.strip() and not any(cell.strip() for cell in status) and row_number not in in_flight:
+            if limit is not None and len(claimed) >= limit:
+                break
+            claimed.append((url.strip(), row_number))
+        last_row = row_number
+
+    if last_row == after:
+        return []
+    if not sheet_cursor.move(sheet_name, after, last_row):
+        # Another consumer claimed these rows first
+        return []
+    # A backlog may have claimed some of them since they were read
+    won = set(sheet_cursor.claim(sheet_name, [row for _, row in claimed]))
+    return [(url, row) for url, row in claimed if row in won]